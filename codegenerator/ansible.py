@@ -35,10 +35,7 @@ class AnsibleGenerator(BaseGenerator):
         """Render command code"""
         self._render(impl_template, context, impl_dest.parent, impl_dest.name)
 
-        unittest_path = test_dest.parent
-
-        unittest_path.mkdir(parents=True, exist_ok=True)
-        Path(unittest_path, "__init__.py").touch()
+        self._touch(Path(test_dest.parent, "__init__.py"))
 
         self._render(test_template, context, test_dest.parent, test_dest.name)
 
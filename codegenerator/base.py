@@ -12,53 +12,1040 @@
 #
 
 import abc
+import argparse
+import calendar
+from collections import OrderedDict
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import gzip
+import hashlib
+import io
+import json
 import logging
+import os
 from pathlib import Path
+import struct
 import subprocess
+import tarfile
+import tempfile
+import threading
+import time
+from typing import Any
+from typing import BinaryIO
+from typing import Iterable
+import zipfile
 import mdformat as md
 
+from jinja2 import BaseLoader
+from jinja2 import ChoiceLoader
 from jinja2 import Environment
+from jinja2 import FileSystemBytecodeCache
 from jinja2 import FileSystemLoader
+from jinja2 import ModuleLoader
+from jinja2 import nodes
 from jinja2 import select_autoescape
 from jinja2 import StrictUndefined
+from jinja2.ext import Extension
+from jinja2.runtime import Macro
+from pydantic import BaseModel
 
 
+class MarkdownCache:
+    """Wrapped markdown persisted across runs
+
+    Results of `wrap_markdown` are stored in the JSON file keyed by the
+    digest of the mdformat options and the input. The whole file is
+    invalidated when the mdformat version changes. Only entries used during
+    the run are saved, so the file does not grow unbounded.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.texts: dict[str, str] = {}
+        self.is_changed: bool = False
+        # Keys of the entries used during the run
+        self._used: set[str] = set()
+        try:
+            data = json.loads(path.read_text())
+            if data["mdformat"] == md.__version__:
+                self.texts = data["texts"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    @staticmethod
+    def _get_key(input: str, options: dict[str, Any]) -> str:
+        digest = hashlib.sha256(json.dumps(options, sort_keys=True).encode())
+        digest.update(b"\0")
+        digest.update(input.encode())
+        return digest.hexdigest()
+
+    def get(self, input: str, options: dict[str, Any]) -> str | None:
+        """Get wrapped markdown (if known)"""
+        key = self._get_key(input, options)
+        text = self.texts.get(key)
+        if text is not None:
+            self._used.add(key)
+        return text
+
+    def set(self, input: str, options: dict[str, Any], text: str) -> None:
+        """Remember wrapped markdown"""
+        key = self._get_key(input, options)
+        self.texts[key] = text
+        self._used.add(key)
+        self.is_changed = True
+
+    def save(self) -> None:
+        """Persist wrapped markdown used during the run (when changed)"""
+        if not self.is_changed and len(self._used) == len(self.texts):
+            return
+        self.texts = {k: v for k, v in self.texts.items() if k in self._used}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(
+            json.dumps(
+                dict(mdformat=md.__version__, texts=self.texts),
+                sort_keys=True,
+            )
+        )
+        self.is_changed = False
+
+
+#: Wrapped markdown persisted across runs (when set)
+markdown_cache: MarkdownCache | None = None
+
+
+@functools.lru_cache(maxsize=4096)
 def wrap_markdown(input: str, width: int = 79) -> str:
-    """Apply mardownify to wrap the markdown"""
-    return md.text(input, options={"wrap": width})
+    """Apply mardownify to wrap the markdown
+
+    Same descriptions are wrapped many times, therefore results are
+    memoized (and looked up in the `markdown_cache` when set).
+    """
+    options: dict[str, Any] = {"wrap": width}
+    if markdown_cache is not None:
+        cached = markdown_cache.get(input, options)
+        if cached is not None:
+            return cached
+    text = md.text(input, options=options)
+    if markdown_cache is not None:
+        markdown_cache.set(input, options, text)
+    return text
+
+
+#: Directory with the templates
+TEMPLATES_DIR = Path(__file__).parent / "templates"
+#: Directory with the precompiled templates (see `compile_templates`)
+COMPILED_TEMPLATES_DIR = Path(__file__).parent / "templates_compiled"
+#: File with the checksum of the templates the compiled ones are built from
+COMPILED_TEMPLATES_CHECKSUM = "checksum"
+
+
+def get_templates_checksum() -> str:
+    """Get checksum of all templates (names and contents)"""
+    checksum = hashlib.sha1()
+    for path in sorted(TEMPLATES_DIR.rglob("*")):
+        if path.is_file():
+            checksum.update(
+                path.relative_to(TEMPLATES_DIR).as_posix().encode()
+            )
+            checksum.update(path.read_bytes())
+    return checksum.hexdigest()
+
+
+class _Token(str):
+    """Literal part of the model digest"""
+
+
+class _ModelEnd:
+    """End of the model in the stack of `get_model_digest`"""
+
+    __slots__ = ("model",)
+
+    def __init__(self, model: BaseModel):
+        self.model = model
+
+
+def get_model_digest(
+    value: BaseModel,
+    digests: dict[int, tuple[BaseModel, bytes]] | None = None,
+) -> bytes:
+    """Get digest of the model content
+
+    Models are walked with an explicit stack so that also very deeply nested
+    models are supported. Every nested model is digested separately and
+    only its digest is included in the digest of the parent, so models
+    shared by several parents are walked only once.
+
+    :param digests: Known digests of the models by their id. It is updated
+        with the digests of all walked models and may be passed again as
+        long as the models are not modified.
+    """
+    if digests is None:
+        digests = {}
+    # Parts of the digests of the models being walked
+    parts: list[list[str]] = [[]]
+    stack: list[Any] = [value]
+    while stack:
+        item = stack.pop()
+        cls = type(item)
+        if cls is _Token:
+            parts[-1].append(item)
+        elif cls is _ModelEnd:
+            digest = hashlib.sha1(",".join(parts.pop()).encode()).digest()
+            digests[id(item.model)] = (item.model, digest)
+            parts[-1].append(digest.hex())
+        elif isinstance(item, BaseModel):
+            known = digests.get(id(item))
+            if known is not None:
+                parts[-1].append(known[1].hex())
+                continue
+            parts.append([f"{cls.__module__}.{cls.__qualname__}"])
+            stack.append(_ModelEnd(item))
+            for k, v in reversed(item.__dict__.items()):
+                stack.extend((v, _Token(f"{k}=")))
+        elif cls is dict:
+            parts[-1].append("{")
+            stack.append(_Token("}"))
+            for k, v in reversed(item.items()):
+                stack.extend((v, _Token(f"{k!r}:")))
+        elif cls is list or cls is tuple:
+            parts[-1].append("[")
+            stack.append(_Token("]"))
+            stack.extend(reversed(item))
+        elif cls is set or cls is frozenset:
+            parts[-1].append("{")
+            stack.append(_Token("}"))
+            stack.extend(sorted(item, key=repr, reverse=True))
+        else:
+            parts[-1].append(repr(item))
+    return bytes.fromhex(parts[0][0])
+
+
+def get_structural_key(value: Any, get_digest=get_model_digest) -> Any:
+    """Get key identifying the value by its structure
+
+    Models are identified by their class and the digest of their content,
+    containers by the keys of their items. Other objects must provide their
+    own `get_structural_key` method (i.e. type managers, which only select
+    the target specific variant of the rendering).
+
+    :param get_digest: Function returning digest of the model
+    :raises TypeError: when the value has no structural key
+    """
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return (type(value), value)
+    if isinstance(value, BaseModel):
+        return (type(value), get_digest(value))
+    if isinstance(value, (list, tuple)):
+        return (
+            type(value),
+            tuple(get_structural_key(x, get_digest) for x in value),
+        )
+    if isinstance(value, dict):
+        return (
+            dict,
+            tuple(
+                (
+                    get_structural_key(k, get_digest),
+                    get_structural_key(v, get_digest),
+                )
+                for k, v in value.items()
+            ),
+        )
+    if isinstance(value, (set, frozenset)):
+        return (
+            frozenset,
+            frozenset(get_structural_key(x, get_digest) for x in value),
+        )
+    get_key = getattr(value, "get_structural_key", None)
+    if get_key is None:
+        raise TypeError(f"Cannot get structural key of {type(value).__name__}")
+    return get_key()
+
+
+class FragmentCacheExtension(Extension):
+    """Cache of the rendered template fragments
+
+    The `{% cache subtype, type_manager %}...{% endcache %}` block is
+    rendered only once for the structurally identical arguments (see
+    `get_structural_key`) and reused afterwards. The block must only depend
+    on its arguments. The cache is disabled by default and enabled by
+    setting `environment.fragment_cache` to an `OrderedDict` (see
+    `enable_fragment_cache`). It keeps `FRAGMENT_CACHE_SIZE` least recently
+    used fragments as long as the environment lives.
+
+    Digests of the models are taken from the argument providing
+    `get_model_digest` (the type manager memoizes them per model) and are
+    only computed from scratch otherwise.
+    """
+
+    tags = {"cache"}
+
+    #: Max count of the cached fragments
+    FRAGMENT_CACHE_SIZE = 4096
+
+    def __init__(self, environment: Environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+        self._lock = threading.Lock()
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args: list[nodes.Expr] = []
+        while parser.stream.current.type != "block_end":
+            if args:
+                parser.stream.expect("comma")
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        # Fragment is identified by the template and the line of the block
+        fragment = nodes.Const(f"{parser.name}:{lineno}")
+        return nodes.CallBlock(
+            self.call_method("_render", [fragment, nodes.List(args)]),
+            [],
+            [],
+            body,
+        ).set_lineno(lineno)
+
+    def _render(self, fragment: str, args: list, caller) -> str:
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        get_digest = get_model_digest
+        for arg in args:
+            get_digest = getattr(arg, "get_model_digest", get_digest)
+        key = (
+            fragment,
+            tuple(get_structural_key(x, get_digest) for x in args),
+        )
+        with self._lock:
+            content = cache.get(key)
+            if content is not None:
+                cache.move_to_end(key)
+                return content
+        content = caller()
+        with self._lock:
+            cache[key] = content
+            while len(cache) > self.FRAGMENT_CACHE_SIZE:
+                cache.popitem(last=False)
+        return content
+
+
+def enable_fragment_cache(environment: Environment) -> None:
+    """Enable cache of the rendered template fragments of the environment"""
+    if environment.fragment_cache is None:
+        environment.fragment_cache = OrderedDict()
+
+
+def _create_environment(loader: BaseLoader, **kwargs) -> Environment:
+    env = Environment(
+        loader=loader,
+        autoescape=select_autoescape(),
+        undefined=StrictUndefined,
+        extensions=[FragmentCacheExtension],
+        **kwargs,
+    )
+    env.filters["wrap_markdown"] = wrap_markdown
+    return env
+
+
+def _get_templates_loader() -> BaseLoader:
+    """Get templates loader preferring precompiled templates
+
+    Precompiled templates are only used when they are built from the
+    current templates.
+    """
+    loader = FileSystemLoader(TEMPLATES_DIR)
+    try:
+        checksum = Path(
+            COMPILED_TEMPLATES_DIR, COMPILED_TEMPLATES_CHECKSUM
+        ).read_text()
+    except OSError:
+        return loader
+    if checksum != get_templates_checksum():
+        logging.warning(
+            "Precompiled templates are outdated and are not used. "
+            "Run `openstack-codegenerator-compile-templates` to update them."
+        )
+        return loader
+    return ChoiceLoader([ModuleLoader(COMPILED_TEMPLATES_DIR), loader])
+
+
+@functools.lru_cache(maxsize=None)
+def get_environment() -> Environment:
+    """Get the Jinja environment shared by all generators
+
+    Templates precompiled into Python modules (`compile_templates`) are
+    preferred. Otherwise compiled templates are additionally stored in the
+    persistent bytecode cache (in the temporary directory of the user), so
+    that they are not compiled again by every process. Cache entries are
+    invalidated by Jinja when the template source changes.
+    """
+    try:
+        bytecode_cache: FileSystemBytecodeCache | None = (
+            FileSystemBytecodeCache()
+        )
+    except RuntimeError:
+        logging.warning("Cannot use templates bytecode cache")
+        bytecode_cache = None
+    return _create_environment(
+        _get_templates_loader(), bytecode_cache=bytecode_cache
+    )
+
+
+def compile_templates(target: Path = COMPILED_TEMPLATES_DIR) -> None:
+    """Precompile all templates into Python modules
+
+    Modules are stored in the `target` directory together with the checksum
+    of the templates they are built from. Package build compiles them into
+    the package (see `codegenerator.hooks.BuildPy`).
+    """
+    checksum = get_templates_checksum()
+    env = _create_environment(FileSystemLoader(TEMPLATES_DIR))
+    env.compile_templates(target, zip=None, ignore_errors=False)
+    Path(target, COMPILED_TEMPLATES_CHECKSUM).write_text(checksum)
+
+
+def compile_templates_main():
+    """Entry point of `openstack-codegenerator-compile-templates`"""
+    parser = argparse.ArgumentParser(
+        description="Precompile templates into Python modules"
+    )
+    parser.add_argument(
+        "--target-dir",
+        default=COMPILED_TEMPLATES_DIR,
+        type=Path,
+        help="Directory to store compiled templates in",
+    )
+    args = parser.parse_args()
+    compile_templates(args.target_dir)
+
+
+class OutputHashes:
+    """Hashes of the output files
+
+    For every file the digest of the content as rendered (before formatting)
+    and the digest of the file as written (after formatting) are persisted
+    in the JSON file. Rendering the same content again does not need to
+    write and format the file as long as the file itself is not changed.
+    Hashes are only recorded once the file is successfully written (and
+    formatted), so a failed run does not hide broken files.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.hashes: dict[str, dict[str, str]] = {}
+        #: Count of files with the changed content
+        self.changed: int = 0
+        #: Count of files with the same content
+        self.unchanged: int = 0
+        # Rendered digests of the files being written
+        self._rendered: dict[str, str] = {}
+        try:
+            self.hashes = {
+                k: v
+                for k, v in json.loads(path.read_text()).items()
+                if isinstance(v, dict)
+            }
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    @staticmethod
+    def _get_key(path: Path) -> str:
+        return Path(path).resolve().as_posix()
+
+    @staticmethod
+    def _get_file_digest(path: Path) -> str | None:
+        try:
+            return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+        except OSError:
+            return None
+
+    def check(self, path: Path, content: str) -> bool:
+        """Check whether content of the file changes"""
+        return self.check_digest(
+            path, hashlib.sha256(content.encode()).hexdigest()
+        )
+
+    def check_digest(self, path: Path, digest: str) -> bool:
+        """Check whether the SHA256 digest of the rendered content changes
+
+        The file is also considered changed when its current content differs
+        from the recorded one.
+        """
+        key = self._get_key(path)
+        known = self.hashes.get(key, {})
+        if known.get("rendered") == digest and known.get(
+            "file"
+        ) == self._get_file_digest(path):
+            self.unchanged += 1
+            return False
+        self._rendered[key] = digest
+        self.changed += 1
+        return True
+
+    def update(self, path: Path) -> None:
+        """Record hashes of the successfully written (or formatted) file"""
+        key = self._get_key(path)
+        rendered = self._rendered.get(key)
+        if rendered is None:
+            return
+        file_digest = self._get_file_digest(path)
+        if file_digest is None:
+            self.discard(path)
+            return
+        self.hashes[key] = dict(rendered=rendered, file=file_digest)
+
+    def discard(self, path: Path) -> None:
+        """Forget hashes of the file (i.e. when it is not formatted)"""
+        key = self._get_key(path)
+        self._rendered.pop(key, None)
+        self.hashes.pop(key, None)
+
+    def save(self) -> None:
+        """Persist hashes"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self.hashes, indent=1, sort_keys=True))
+
+
+def _get_file_mode() -> int:
+    """Get mode of the new files (applying umask like `open` would do)"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+class OutputTree:
+    """In-memory tree of the output files
+
+    Rendered files are collected in memory and written together by `flush`.
+    Every file is first written into a temporary file next to the target and
+    all of them are renamed to the targets only when all writes succeeded.
+    A failing run therefore does not leave a half updated output.
+    """
+
+    def __init__(self):
+        self.files: dict[Path, str] = {}
+
+    def write(self, path: Path, content: str) -> None:
+        """Add file (replacing the previous content)"""
+        self.files[path] = content
+
+    def flush(self, workers: int = 1) -> None:
+        """Write all files
+
+        :param workers: Count of threads writing the files
+        """
+        for directory in set(x.parent for x in self.files):
+            directory.mkdir(parents=True, exist_ok=True)
+        mode = _get_file_mode()
+
+        def write(path: Path, content: str) -> Path:
+            fd, temp_path = tempfile.mkstemp(
+                dir=path.parent, prefix=f".{path.name}."
+            )
+            try:
+                with os.fdopen(fd, "w") as fp:
+                    fp.write(content)
+                os.chmod(temp_path, mode)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+            return Path(temp_path)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                path: executor.submit(write, path, content)
+                for path, content in self.files.items()
+            }
+        temp_paths: dict[Path, Path] = {}
+        errors = []
+        for path, future in futures.items():
+            try:
+                temp_paths[path] = future.result()
+            except Exception as ex:
+                errors.append(ex)
+        if errors:
+            for temp_path in temp_paths.values():
+                temp_path.unlink()
+            raise errors[0]
+        for path, temp_path in temp_paths.items():
+            logging.debug("Writing %s" % path)
+            os.replace(temp_path, path)
+        self.files = {}
+
+
+class OutputSink(abc.ABC):
+    """Destination of the rendered files"""
+
+    #: Files are written into the local filesystem (and can be formatted)
+    is_local: bool = False
+
+    def __init__(self, root: Path = Path(".")):
+        #: Paths of the files are stored relative to the root
+        self.root = root
+
+    def get_name(self, path: Path) -> str:
+        """Get name of the file relative to the root"""
+        try:
+            return Path(path).relative_to(self.root).as_posix()
+        except ValueError:
+            return Path(path).as_posix().lstrip("/")
+
+    @abc.abstractmethod
+    def write(
+        self,
+        path: Path,
+        chunks: Iterable[str],
+        output_hashes: OutputHashes | None = None,
+    ) -> bool:
+        """Write file
+
+        :param path: Path of the file
+        :param chunks: Rendered content
+        :param output_hashes: Hashes to skip unchanged files (only used by
+            the local sinks)
+        :returns: `False` if the file was skipped since it is not changed
+        """
+
+    @contextlib.contextmanager
+    def deferred(self):
+        """Postpone writing of the files written in the context
+
+        Used for files rendered multiple times during the run. Sinks which
+        can replace files write them directly.
+        """
+        yield
+
+    def close(self) -> None:
+        """Finish the output"""
+
+
+class DirectorySink(OutputSink):
+    """Sink writing files into the directory tree"""
+
+    is_local = True
+
+    def write(
+        self,
+        path: Path,
+        chunks: Iterable[str],
+        output_hashes: OutputHashes | None = None,
+    ) -> bool:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Content is written (and hashed) into the temporary file, which
+        # replaces the target only when rendering succeeds and the content
+        # changes. Failed rendering therefore keeps the previous file.
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(
+            dir=path.parent, prefix=f".{path.name}."
+        )
+        try:
+            with os.fdopen(fd, "w") as fp:
+                for chunk in chunks:
+                    fp.write(chunk)
+                    digest.update(chunk.encode())
+            if output_hashes is not None and not output_hashes.check_digest(
+                path, digest.hexdigest()
+            ):
+                os.unlink(temp_path)
+                return False
+            os.chmod(temp_path, _get_file_mode())
+            logging.debug("Writing %s" % path)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return True
+
+
+class FileSink(OutputSink):
+    """Sink writing files sequentially into the binary file
+
+    Every file is written out as soon as it is rendered. Only the content of
+    the single file is held in memory (its size is needed upfront). Files
+    written within `deferred` (i.e. modules rendered multiple times during
+    the run) are collected instead and written once, with the last content,
+    on `close`. Other files written multiple times end up multiple times in
+    the output and the last one wins when it is unpacked.
+
+    :param fileobj: Binary file to write the output into
+    :param close_fileobj: Close the file when the sink is closed
+    """
+
+    def __init__(
+        self,
+        fileobj: BinaryIO,
+        root: Path = Path("."),
+        close_fileobj: bool = False,
+    ):
+        super().__init__(root)
+        self.fileobj = fileobj
+        self.close_fileobj = close_fileobj
+        #: Deferred files written on `close`
+        self.deferred_files: dict[str, bytes] = {}
+        self._deferring: bool = False
+
+    @contextlib.contextmanager
+    def deferred(self):
+        """Collect files written in the context and write them on `close`"""
+        deferring = self._deferring
+        self._deferring = True
+        try:
+            yield
+        finally:
+            self._deferring = deferring
+
+    def write(
+        self,
+        path: Path,
+        chunks: Iterable[str],
+        output_hashes: OutputHashes | None = None,
+    ) -> bool:
+        name = self.get_name(path)
+        content = "".join(chunks).encode()
+        if self._deferring or name in self.deferred_files:
+            self.deferred_files[name] = content
+        else:
+            self._emit(name, content)
+        return True
+
+    @abc.abstractmethod
+    def _emit(self, name: str, content: bytes) -> None:
+        """Write file into the `fileobj`"""
+
+    def _finish(self) -> None:
+        """Complete the output once all files are written"""
+
+    def close(self) -> None:
+        for name, content in self.deferred_files.items():
+            self._emit(name, content)
+        self.deferred_files = {}
+        self._finish()
+        if self.close_fileobj:
+            self.fileobj.close()
+        else:
+            self.fileobj.flush()
+
+
+class ArchiveSink(FileSink):
+    """Sink writing files into the archive
+
+    The archive is written sequentially (therefore also into the pipe) and
+    is reproducible: members get fixed timestamps and permissions.
+
+    :param format: One of the `ARCHIVE_FORMATS`
+    """
+
+    ARCHIVE_FORMATS = ["tar", "tar.gz", "tar.xz", "zip"]
+    #: Timestamp of the archive members (the earliest one zip supports)
+    MTIME = (1980, 1, 1, 0, 0, 0)
+
+    def __init__(
+        self,
+        fileobj: BinaryIO,
+        root: Path = Path("."),
+        format: str = "tar",
+        close_fileobj: bool = False,
+    ):
+        super().__init__(fileobj, root, close_fileobj)
+        if format not in self.ARCHIVE_FORMATS:
+            raise ValueError(f"Unsupported archive format {format}")
+        self.format = format
+        # Archive opened with the first member
+        self._archive: zipfile.ZipFile | tarfile.TarFile | None = None
+        # Compressing stream between the tar archive and the `fileobj`
+        self._compressor: gzip.GzipFile | None = None
+
+    def _open(self) -> zipfile.ZipFile | tarfile.TarFile:
+        if self._archive is not None:
+            return self._archive
+        if self.format == "zip":
+            self._archive = zipfile.ZipFile(self.fileobj, "w")
+            return self._archive
+        compression = self.format.partition(".")[2]
+        fileobj: BinaryIO = self.fileobj
+        if compression == "gz":
+            # Gzip header would contain the current time otherwise
+            self._compressor = gzip.GzipFile(
+                filename="", mode="wb", fileobj=self.fileobj, mtime=0
+            )
+            fileobj = self._compressor  # type: ignore[assignment]
+            compression = ""
+        self._archive = tarfile.open(fileobj=fileobj, mode=f"w|{compression}")
+        return self._archive
+
+    def _emit(self, name: str, content: bytes) -> None:
+        archive = self._open()
+        if isinstance(archive, zipfile.ZipFile):
+            zip_info = zipfile.ZipInfo(name, date_time=self.MTIME)
+            zip_info.compress_type = zipfile.ZIP_DEFLATED
+            zip_info.external_attr = 0o644 << 16
+            archive.writestr(zip_info, content)
+            return
+        tar_info = tarfile.TarInfo(name)
+        tar_info.size = len(content)
+        tar_info.mode = 0o644
+        tar_info.mtime = calendar.timegm(self.MTIME)
+        archive.addfile(tar_info, io.BytesIO(content))
+
+    def _finish(self) -> None:
+        # Archive without members is still a valid (empty) archive
+        self._open().close()
+        self._archive = None
+        if self._compressor is not None:
+            self._compressor.close()
+            self._compressor = None
+
+
+class StreamSink(FileSink):
+    """Sink writing files into the binary stream (i.e. stdout)
+
+    Every file is written as its name and content (UTF-8), both prefixed by
+    their length in bytes as 8 bytes big-endian unsigned integer.
+    """
+
+    def _emit(self, name: str, content: bytes) -> None:
+        encoded_name = name.encode()
+        self.fileobj.write(struct.pack(">Q", len(encoded_name)) + encoded_name)
+        self.fileobj.write(struct.pack(">Q", len(content)))
+        self.fileobj.write(content)
+
+
+class TemplateProfiler:
+    """Profiler of the template rendering
+
+    Once installed into the environment cumulative time and count of calls
+    of every rendered template (including the included and imported ones)
+    and every called macro are recorded. Time of the nested calls is
+    included in the total time of the caller, but not in its own time.
+    Rendering is expected to happen in a single thread.
+    """
+
+    def __init__(self):
+        #: Stats as `(kind, name) -> [calls, total time, own time]`
+        self.stats: dict[tuple[str, str], list] = {}
+        # Time spent in the nested calls of every active call
+        self._stack: list[float] = []
+        self._env: Environment | None = None
+        self._get_template = None
+        self._macro_invoke = None
+        self._render_funcs: dict = {}
+
+    def _measure(self, key: tuple[str, str], func, *args, count=True):
+        stats = self.stats.setdefault(key, [0, 0.0, 0.0])
+        if count:
+            stats[0] += 1
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._stack.pop()
+            stats[1] += elapsed
+            stats[2] += elapsed - nested
+            if self._stack:
+                self._stack[-1] += elapsed
+
+    def _instrument_template(self, template) -> None:
+        if template in self._render_funcs:
+            return
+        root_render_func = template.root_render_func
+        self._render_funcs[template] = root_render_func
+        key = ("template", template.name)
+
+        def profiled_root_render_func(context):
+            # Template is rendered by chunks, every chunk is measured
+            stream = self._measure(key, root_render_func, context)
+            while True:
+                try:
+                    chunk = self._measure(key, next, stream, count=False)
+                except StopIteration:
+                    return
+                yield chunk
+
+        template.root_render_func = profiled_root_render_func
+
+    def install(self, env: Environment) -> None:
+        """Start recording rendering of templates of the environment"""
+        if self._env is not None:
+            raise RuntimeError("Profiler is already installed")
+        self._env = env
+        self._get_template = get_template = env.get_template
+        self._macro_invoke = macro_invoke = Macro._invoke
+
+        def profiled_get_template(*args, **kwargs):
+            template = get_template(*args, **kwargs)
+            self._instrument_template(template)
+            return template
+
+        def profiled_macro_invoke(macro, arguments, autoescape):
+            template_name = macro._func.__globals__.get("name")
+            return self._measure(
+                ("macro", f"{template_name}:{macro.name}"),
+                macro_invoke,
+                macro,
+                arguments,
+                autoescape,
+            )
+
+        env.get_template = profiled_get_template
+        Macro._invoke = profiled_macro_invoke
+
+    def uninstall(self) -> None:
+        """Stop recording"""
+        if self._env is None:
+            return
+        Macro._invoke = self._macro_invoke
+        del self._env.get_template
+        for template, root_render_func in self._render_funcs.items():
+            template.root_render_func = root_render_func
+        self._render_funcs = {}
+        self._env = None
+
+    def report(self, limit: int | None = None) -> str:
+        """Get report of the recorded stats ranked by the own time
+
+        :param limit: Max count of reported entries
+        """
+        ranked = sorted(self.stats.items(), key=lambda x: (-x[1][2], x[0]))[
+            :limit
+        ]
+        lines = [
+            f"{'own (s)':>10} {'total (s)':>10} {'calls':>8}  name",
+        ]
+        for (kind, name), (calls, total, own) in ranked:
+            lines.append(
+                f"{own:10.4f} {total:10.4f} {calls:8d}  {kind} {name}"
+            )
+        return "\n".join(lines)
 
 
 class BaseGenerator:
+    #: Files are written through the `output_sink` (otherwise only the
+    #: directory output is supported and neither the output tree nor the
+    #: output hashes are used)
+    supports_output_sink: bool = True
+
     def __init__(self):
         # Lower debug level of mdformat
         logging.getLogger("markdown_it").setLevel(logging.INFO)
 
-        self.env = Environment(
-            loader=FileSystemLoader("codegenerator/templates"),
-            autoescape=select_autoescape(),
-            undefined=StrictUndefined,
-        )
-        self.env.filters["wrap_markdown"] = wrap_markdown
+        self.env = get_environment()
+        #: Hashes of the output to only write changed files (when set)
+        self.output_hashes: OutputHashes | None = None
+        # Rendered files which were not changed (and need no formatting)
+        self._unchanged_paths: set[Path] = set()
+        #: In-memory output written by `flush_output` (when set)
+        self.output_tree: OutputTree | None = None
+        # Paths to format once the output tree is flushed
+        self._pending_format: list = []
+        #: Destination of the rendered files
+        self.output_sink: OutputSink = DirectorySink()
+        #: Profiler of the template rendering (when set)
+        self.template_profiler: TemplateProfiler | None = None
 
-    def get_parser(self, parser):
+    @classmethod
+    def get_parser(cls, parser):
         return parser
 
     def _render(self, template, context, dest, fname):
-        """Render single template"""
+        """Render single template
+
+        Unless the output tree is used the template is rendered by chunks
+        directly into the output sink.
+        """
         template = self.env.get_template(template)
-        content = template.render(**context)
-        dest.mkdir(parents=True, exist_ok=True)
-        with open(Path(dest, fname), "w") as fp:
-            logging.debug("Writing %s" % (fp.name))
-            fp.write(content)
+        self._write(Path(dest, fname), template.generate(**context))
+
+    def _write(self, path: Path, chunks: Iterable[str]) -> None:
+        """Write the content given by chunks into the output"""
+        if self.output_tree is not None:
+            content = "".join(chunks)
+            if self.output_hashes is None or self.output_hashes.check(
+                path, content
+            ):
+                self._unchanged_paths.discard(path)
+                self.output_tree.write(path, content)
+            else:
+                self._skip_unchanged(path)
+            return
+        if self.output_sink.write(path, chunks, self.output_hashes):
+            self._unchanged_paths.discard(path)
+            if self.output_hashes is not None:
+                self.output_hashes.update(path)
+        else:
+            self._skip_unchanged(path)
+
+    def _touch(self, path: Path) -> None:
+        """Ensure the (empty) file exists without modifying present one
+
+        Non-local sinks get an empty file.
+        """
+        if not self.output_sink.is_local:
+            self.output_sink.write(path, [])
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+
+    def _skip_unchanged(self, path: Path) -> None:
+        logging.debug("Skipping unchanged %s" % path)
+        self._unchanged_paths.add(path)
+
+    def _get_paths_to_format(self, paths):
+        """Get paths to format now
+
+        Rendered files which were not changed are excluded. Formatting of
+        the files in the output tree is postponed until they are flushed.
+        Files written into not local sinks are not formatted.
+        """
+        if not self.output_sink.is_local:
+            return []
+        if self.output_tree is not None:
+            self._pending_format.extend(paths)
+            return []
+        return [x for x in paths if Path(x) not in self._unchanged_paths]
+
+    def flush_output(self, workers: int = 1) -> None:
+        """Write the output tree and format the written code"""
+        output_tree = self.output_tree
+        if output_tree is None:
+            return
+        pending_format = list(dict.fromkeys(self._pending_format))
+        self.output_tree = None
+        try:
+            paths = list(output_tree.files.keys())
+            output_tree.flush(workers)
+            if self.output_hashes is not None:
+                for path in paths:
+                    self.output_hashes.update(path)
+            self._format_code(*pending_format)
+        finally:
+            self._pending_format = []
+            self.output_tree = output_tree
 
     def _format_code(self, *args):
         """Format code using Black
 
         :param *args: Path to the code to format
         """
-        for path in args:
-            subprocess.run(["black", "-l", "79", path])
+        for path in self._get_paths_to_format(args):
+            self._run_formatter(["black", "-l", "79"], path)
+
+    def _run_formatter(self, command: list[str], path) -> None:
+        """Run formatter of the file
+
+        Hashes of the file are updated when formatting succeeds and dropped
+        otherwise, so that the file is written again by the next run.
+        """
+        result = subprocess.run([*command, path])
+        if self.output_hashes is not None:
+            if result.returncode == 0:
+                self.output_hashes.update(Path(path))
+            else:
+                self.output_hashes.discard(Path(path))
 
     @abc.abstractmethod
     def generate(
@@ -20,20 +20,37 @@ from pathlib import Path
 import re
 import sys
 
-from openstack import resource
-from sphinx import pycode
 import yaml
 
-from codegenerator.ansible import AnsibleGenerator
+from codegenerator import base
 from codegenerator import common
-from codegenerator.jsonschema import JsonSchemaGenerator
-from codegenerator.metadata import MetadataGenerator
-from codegenerator.openapi_spec import OpenApiSchemaGenerator
-from codegenerator.osc import OSCGenerator
-from codegenerator.rust_cli import RustCliGenerator
-from codegenerator.rust_sdk import RustSdkGenerator
+from codegenerator.base import ArchiveSink
+from codegenerator.base import BaseGenerator
+from codegenerator.base import OutputHashes
+from codegenerator.base import OutputSink
+from codegenerator.base import OutputTree
+from codegenerator.base import StreamSink
+from codegenerator.base import TemplateProfiler
 from codegenerator.types import Metadata
 
+#: Generators of the targets as `(module, class name)`. Modules are only
+#: imported for the selected target.
+GENERATORS: dict[str, tuple[str, str]] = {
+    "osc": ("codegenerator.osc", "OSCGenerator"),
+    "ansible": ("codegenerator.ansible", "AnsibleGenerator"),
+    "rust-sdk": ("codegenerator.rust_sdk", "RustSdkGenerator"),
+    "rust-cli": ("codegenerator.rust_cli", "RustCliGenerator"),
+    "openapi-spec": ("codegenerator.openapi_spec", "OpenApiSchemaGenerator"),
+    "jsonschema": ("codegenerator.jsonschema", "JsonSchemaGenerator"),
+    "metadata": ("codegenerator.metadata", "MetadataGenerator"),
+}
+
+
+def get_generator_class(target: str) -> type[BaseGenerator]:
+    """Import generator class of the target"""
+    mod_name, class_name = GENERATORS[target]
+    return getattr(importlib.import_module(mod_name), class_name)
+
 
 class ResourceProcessor:
     def __init__(self, mod_name, class_name):
@@ -100,6 +117,8 @@ class ResourceProcessor:
             self.attrs[k] = dict(attr=v, docs=doc)
 
     def get_attr_docs(self):
+        from sphinx import pycode
+
         mod = pycode.ModuleAnalyzer.for_module(self.mod_name)
         mod.analyze()
         result = {}
@@ -111,6 +130,8 @@ class ResourceProcessor:
         return result
 
     def body_attrs(self):
+        from openstack import resource
+
         for attr in inspect.getmembers(self.resource_class):
             if isinstance(attr[1], resource.Body):
                 yield attr
@@ -151,15 +172,7 @@ def main():
     parser.add_argument(
         "--target",
         required=True,
-        choices=[
-            "osc",
-            "ansible",
-            "rust-sdk",
-            "rust-cli",
-            "openapi-spec",
-            "jsonschema",
-            "metadata",
-        ],
+        choices=list(GENERATORS.keys()),
         help="Target for which to generate code",
     )
     parser.add_argument(
@@ -208,22 +221,129 @@ def main():
         action="store_true",
         help=("Metadata resource name filter"),
     )
+    parser.add_argument(
+        "--write-if-changed",
+        action="store_true",
+        help=(
+            "Only write (and format) files with changed content. Hashes of "
+            "the content are stored in the `.codegenerator_hashes.json` of "
+            "the work dir"
+        ),
+    )
+    parser.add_argument(
+        "--buffer-output",
+        action="store_true",
+        help=(
+            "Collect output in memory and write it only at the end of the "
+            "successful run"
+        ),
+    )
+    parser.add_argument(
+        "--output-workers",
+        type=int,
+        default=1,
+        help="Count of threads writing buffered output",
+    )
+    parser.add_argument(
+        "--output-sink",
+        choices=["directory", "stream"] + ArchiveSink.ARCHIVE_FORMATS,
+        default="directory",
+        help=(
+            "Destination of the generated files: the work dir, archive "
+            "of the given format or stream of the length-prefixed files "
+            "(written into the `--output-file`). Only files in the work dir "
+            "are formatted"
+        ),
+    )
+    parser.add_argument(
+        "--output-file",
+        default="-",
+        help="File to write the archive or stream into (`-` for stdout)",
+    )
+    parser.add_argument(
+        "--cache-markdown",
+        action="store_true",
+        help=(
+            "Reuse wrapped markdown across runs. It is stored in the "
+            "`.codegenerator_markdown.json` of the work dir"
+        ),
+    )
+    parser.add_argument(
+        "--cache-fragments",
+        action="store_true",
+        help=(
+            "Render identical type definitions only once and reuse them "
+            "within the run"
+        ),
+    )
+    parser.add_argument(
+        "--profile-templates",
+        action="store_true",
+        help=(
+            "Record time spent rendering every template and macro and "
+            "report the hot spots at the end of the run"
+        ),
+    )
 
-    generators = {
-        "osc": OSCGenerator(),
-        "ansible": AnsibleGenerator(),
-        "rust-sdk": RustSdkGenerator(),
-        "rust-cli": RustCliGenerator(),
-        "openapi-spec": OpenApiSchemaGenerator(),
-        "jsonschema": JsonSchemaGenerator(),
-        "metadata": MetadataGenerator(),
-    }
-
-    for g, v in generators.items():
-        v.get_parser(parser)
+    # Only the generator of the selected target is imported and registers
+    # its arguments (also for the `--help`)
+    target_parser = argparse.ArgumentParser(add_help=False)
+    target_parser.add_argument("--target", choices=list(GENERATORS.keys()))
+    (target_args, _) = target_parser.parse_known_args()
+    if target_args.target:
+        get_generator_class(target_args.target).get_parser(parser)
 
     args = parser.parse_args()
+    generator_class = get_generator_class(args.target)
+    if args.output_sink != "directory":
+        if args.buffer_output or args.write_if_changed:
+            parser.error(
+                "--buffer-output and --write-if-changed are only supported "
+                "with the directory output sink"
+            )
+        if not generator_class.supports_output_sink:
+            parser.error(
+                f"Target {args.target} only supports the directory output "
+                "sink"
+            )
+    if not generator_class.supports_output_sink:
+        # Target writes its files itself
+        if args.buffer_output or args.write_if_changed:
+            parser.error(
+                f"Target {args.target} does not support --buffer-output and "
+                "--write-if-changed"
+            )
     logging.basicConfig(level=logging.DEBUG)
+    target_generator = generator_class()
+    if args.output_sink != "directory":
+        target_generator.output_sink = _get_output_sink(args)
+    if args.buffer_output:
+        target_generator.output_tree = OutputTree()
+    if args.cache_markdown:
+        base.markdown_cache = base.MarkdownCache(
+            Path(args.work_dir or ".", ".codegenerator_markdown.json")
+        )
+    if args.cache_fragments:
+        base.enable_fragment_cache(target_generator.env)
+    if args.profile_templates:
+        target_generator.template_profiler = TemplateProfiler()
+        target_generator.template_profiler.install(target_generator.env)
+    if args.write_if_changed:
+        target_generator.output_hashes = OutputHashes(
+            Path(args.work_dir or ".", ".codegenerator_hashes.json")
+        )
+    if getattr(args, "shared_types", False):
+        from codegenerator import rust_sdk
+
+        # Shared types module is generated from all operations of the
+        # service, partial runs would drop types used by other operations
+        if not args.metadata or args.resource:
+            parser.error(
+                "--shared-types requires --metadata and can not be combined "
+                "with --resource"
+            )
+        if isinstance(target_generator, rust_sdk.RustSdkGenerator):
+            target_generator.shared_types = rust_sdk.SharedTypes()
     generator = Generator()
 
     if args.metadata:
@@ -257,9 +377,11 @@ def main():
                         ).resolve()
                     )
 
-                    for mod_path, mod_name, path in generators[
-                        args.target
-                    ].generate(
+                    for (
+                        mod_path,
+                        mod_name,
+                        path,
+                    ) in target_generator.generate(
                         res,
                         args.work_dir,
                         openapi_spec=openapi_spec,
@@ -286,6 +408,14 @@ def main():
                         )
                     )
 
+        if getattr(args, "shared_types", False):
+            from codegenerator import rust_sdk
+
+            if isinstance(target_generator, rust_sdk.RustSdkGenerator):
+                res_mods.extend(
+                    target_generator.generate_types_mods(args.work_dir)
+                )
+
         if args.target == "rust-sdk" and not args.resource:
             resource_results: dict[str, dict] = dict()
             for mod_path, mod_name, path in res_mods:
@@ -317,7 +447,7 @@ def main():
                         x["mods"].add(mod_name)
 
                 for path, gen_data in resource_results.items():
-                    generators["rust-sdk"].generate_mod(
+                    target_generator.generate_mod(
                         args.work_dir,
                         path.split("/"),
                         gen_data["mods"],
@@ -325,19 +455,57 @@ def main():
                         res.split(".")[-1].capitalize(),
                         service_name=path.split("/")[0],
                     )
+        _finish_output(target_generator, args)
         exit(0)
 
     rp = None
     if args.module and args.class_name:
         rp = ResourceProcessor(args.module, args.class_name)
 
-    generators[args.target].generate(
+    target_generator.generate(
         rp,
         args.work_dir,
         openapi_spec=None,
         operation_id=args.openapi_operation_id,
         args=args,
     )
+    _finish_output(target_generator, args)
+
+
+def _get_output_sink(args) -> OutputSink:
+    """Get output sink writing into the `--output-file`"""
+    is_stdout = args.output_file == "-"
+    fileobj = sys.stdout.buffer if is_stdout else open(args.output_file, "wb")
+    root = Path(args.work_dir or ".")
+    if args.output_sink == "stream":
+        return StreamSink(fileobj, root, close_fileobj=not is_stdout)
+    return ArchiveSink(
+        fileobj, root, args.output_sink, close_fileobj=not is_stdout
+    )
+
+
+def _finish_output(generator: BaseGenerator, args) -> None:
+    """Flush buffered output, save caches and report changed files
+
+    Profile of the template rendering is reported when recorded.
+    """
+    generator.flush_output(args.output_workers)
+    generator.output_sink.close()
+    if generator.output_hashes is not None:
+        generator.output_hashes.save()
+        logging.info(
+            "Changed files: %d (unchanged: %d)",
+            generator.output_hashes.changed,
+            generator.output_hashes.unchanged,
+        )
+    if base.markdown_cache is not None:
+        base.markdown_cache.save()
+    if generator.template_profiler is not None:
+        generator.template_profiler.uninstall()
+        logging.info(
+            "Templates rendering profile:\n%s",
+            generator.template_profiler.report(limit=50),
+        )
 
 
 if __name__ == "__main__":
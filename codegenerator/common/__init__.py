@@ -10,14 +10,13 @@
 #   License for the specific language governing permissions and limitations
 #   under the License.
 #
+import functools
 import logging
 from pathlib import Path
 from typing import Any
 import re
 
-import jsonref
 import yaml
-from openapi_core import Spec
 from pydantic import BaseModel
 
 VERSION_RE = re.compile(r"[Vv][0-9.]*")
@@ -65,6 +64,10 @@ class BaseCompoundType(BaseModel):
 
 def get_openapi_spec(path: str | Path):
     """Load OpenAPI spec from a file"""
+    # Heavy dependencies only needed when the spec is really loaded
+    import jsonref
+    from openapi_core import Spec
+
     with open(path, "r") as fp:
         spec_data = jsonref.replace_refs(yaml.safe_load(fp), proxies=False)
     return Spec.from_dict(spec_data)
@@ -526,6 +529,7 @@ def get_rust_service_type_from_str(xtype: str):
             return xtype
 
 
+@functools.lru_cache(maxsize=4096)
 def make_ascii_string(description: str | None) -> str | None:
     """Make sure a string is a valid ASCII charset
 
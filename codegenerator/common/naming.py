@@ -0,0 +1,84 @@
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+"""Derivation of identifiers from the API names
+
+Same names (i.e. attribute names) are processed over and over again during
+generation. All derivations are pure functions of the name and therefore
+memoized.
+"""
+import functools
+
+from codegenerator import common
+
+#: Names that can not be used as local Rust attribute names
+RESERVED_NAMES: frozenset[str] = frozenset(
+    ["type", "self", "enum", "ref", "default"]
+)
+
+
+@functools.lru_cache(maxsize=None)
+def split_name(name: str) -> tuple[str, ...]:
+    """Split camelCase or [`:`,`_`,`-`] separated name into parts"""
+    return tuple(common.SPLIT_NAME_RE.split(name))
+
+
+@functools.lru_cache(maxsize=None)
+def snake_case(name: str, separator: str = "_") -> str:
+    """Get lowercase name with parts joined with the separator"""
+    return separator.join(x.lower() for x in split_name(name))
+
+
+@functools.lru_cache(maxsize=None)
+def camel_case(name: str) -> str:
+    """Get CamelCase name (i.e. for the type names)"""
+    return "".join(x.capitalize() for x in split_name(name))
+
+
+def module_name(name: str) -> str:
+    """Get module name"""
+    return snake_case(name)
+
+
+@functools.lru_cache(maxsize=None)
+def local_name(
+    name: str, reserved_names: frozenset[str] = RESERVED_NAMES
+) -> str:
+    """Get local (snake_case) attribute name
+
+    Reserved names are escaped with the `_` prefix.
+    """
+    result = snake_case(name.replace(".", "_"))
+    if result in reserved_names:
+        result = f"_{result}"
+    return result
+
+
+class NameScope:
+    """Names used in a single scope (i.e. Rust module) and their owners
+
+    Used to detect conflicts of the names derived for different objects.
+    """
+
+    def __init__(self):
+        self._owners: dict[str, object] = {}
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._owners
+
+    def is_conflicting(self, name: str, owner: object) -> bool:
+        """Check whether the name is already used by another owner"""
+        return name in self._owners and self._owners[name] != owner
+
+    def add(self, name: str, owner: object) -> None:
+        """Register name as used by the owner"""
+        self._owners[name] = owner
@@ -10,17 +10,19 @@
 #   License for the specific language governing permissions and limitations
 #   under the License.
 #
+import functools
 import logging
-import re
-from typing import Type, Any, Generator, Tuple
+from types import MappingProxyType
+from typing import Type, Any, Generator, Mapping, Tuple, TypeVar
 
 from pydantic import BaseModel
 
+from codegenerator.base import get_model_digest
 from codegenerator.common import BasePrimitiveType
 from codegenerator.common import BaseCombinedType
 from codegenerator.common import BaseCompoundType
 from codegenerator import model
-from codegenerator import common
+from codegenerator.common import naming
 
 
 class Boolean(BasePrimitiveType):
@@ -210,7 +212,7 @@ class BTreeSet(BaseCombinedType):
 
     @property
     def imports(self):
-        imports = self.item_type.imports
+        imports = set(self.item_type.imports)
         imports.add("std::collections::BTreeSet")
         return imports
 
@@ -274,8 +276,7 @@ class Struct(BaseCompoundType):
     def lifetimes(self):
         lifetimes_: set[str] = set()
         for field in self.fields.values():
-            if field.data_type.lifetimes:
-                lifetimes_.update(field.data_type.lifetimes)
+            lifetimes_.update(field.data_type.lifetimes or [])
         return lifetimes_
 
     @property
@@ -325,8 +326,7 @@ class Enum(BaseCompoundType):
     def lifetimes(self):
         lifetimes_: set[str] = set()
         for kind in self.kinds.values():
-            if kind.data_type.lifetimes:
-                lifetimes_.update(kind.data_type.lifetimes)
+            lifetimes_.update(kind.data_type.lifetimes or [])
         return lifetimes_
 
     @property
@@ -404,19 +404,46 @@ class RequestParameter(BaseModel):
         return self.data_type.lifetimes
 
 
+TypeManagerT = TypeVar("TypeManagerT", bound="TypeManager")
+
+
 class TypeManager:
     """Rust type manager
 
     The class is responsible for converting ADT models into types suitable
     for Rust.
+
+    Instances do not share mutable state and do not modify the models, so
+    that different instances (possibly converting the same models) can be
+    used concurrently in multiple threads. A single instance is not thread
+    safe.
     """
 
-    models: list = []
+    # Per instance state (initialized in `__init__`)
+    models: list
+    #: Target independent lowering of the models
+    lowered: model.LoweredModels
+    #: Index of the models by their references
+    models_by_reference: dict[model.Reference, model.ADT]
+    #: Dependency graph of the models (references of the directly used types)
+    _model_children: dict[model.Reference, list[model.Reference]]
     refs: dict[
         model.Reference,
         BasePrimitiveType | BaseCombinedType | BaseCompoundType,
-    ] = {}
-    parameters: dict[str, Type[RequestParameter] | RequestParameter] = {}
+    ]
+    parameters: dict[str, Type[RequestParameter] | RequestParameter]
+    #: Memoized derived views (root type, subtypes, imports, ...)
+    _views: dict[Any, Any]
+    #: Converted structs by their name (used to resolve name conflicts)
+    _structs_by_name: dict[str, list[Struct]]
+    #: List of `(old_name, new_name)` renames done to resolve name conflicts
+    model_renames: list[tuple[str, str]]
+    #: List of the models to be ignored
+    ignored_models: list[model.Reference]
+
+    #: Converted primitives shared by all instances of the class
+    _primitive_types_cache: dict[tuple, BasePrimitiveType | BaseCombinedType]
+    _primitive_types_cache = {}
 
     #: Base mapping of the primitive data-types
     base_primitive_type_mapping: dict[
@@ -433,14 +460,16 @@ class TypeManager:
         model.PrimitiveAny: JsonValue,
     }
 
-    #: Extension for primitives data-type mapping
-    primitive_type_mapping: dict[
+    #: Extension for primitives data-type mapping. Subclasses define the
+    #: extension and get the (read-only) mapping merged with the base mapping
+    primitive_type_mapping: Mapping[
         Type[model.PrimitiveType],
         Type[BasePrimitiveType] | Type[BaseCombinedType],
     ]
 
-    #: Extensions of the data-type mapping
-    data_type_mapping: dict[
+    #: Extensions of the data-type mapping (merged with the base mapping
+    #: similarly to the `primitive_type_mapping`)
+    data_type_mapping: Mapping[
         Type[model.ADT], Type[BaseCombinedType] | Type[BaseCompoundType]
     ]
     #: Base data-type mapping
@@ -462,32 +491,39 @@ class TypeManager:
     #: StringEnum Type class
     string_enum_class: Type[StringEnum] | StringEnum = StringEnum
 
-    #: List of the models to be ignored
-    ignored_models: list[model.Reference] = []
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Resolve effective mappings once. Entries of the subclass win.
+        cls.primitive_type_mapping = MappingProxyType(
+            {
+                **cls.base_primitive_type_mapping,
+                **getattr(cls, "primitive_type_mapping", {}),
+            }
+        )
+        cls.data_type_mapping = MappingProxyType(
+            {
+                **cls.base_data_type_mapping,
+                **getattr(cls, "data_type_mapping", {}),
+            }
+        )
+        # Every subclass has own mapping, therefore also own cache
+        cls._primitive_types_cache = {}
 
     def __init__(self):
         self.models = []
+        self.lowered = model.LoweredModels()
+        self.models_by_reference = {}
+        self._model_children = {}
         self.refs = {}
         self.parameters = {}
-
-        # Set base mapping entries into the data_type_mapping
-        for k, v in self.base_primitive_type_mapping.items():
-            if k not in self.primitive_type_mapping:
-                self.primitive_type_mapping[k] = v
-
-        for k, v in self.base_data_type_mapping.items():
-            if k not in self.data_type_mapping:
-                self.data_type_mapping[k] = v
+        self._views = {}
+        self._structs_by_name = {}
+        self.model_renames = []
+        self.ignored_models = []
 
     def get_local_attribute_name(self, name: str) -> str:
         """Get localized attribute name"""
-        name = name.replace(".", "_")
-        attr_name = "_".join(
-            x.lower() for x in re.split(common.SPLIT_NAME_RE, name)
-        )
-        if attr_name in ["type", "self", "enum", "ref", "default"]:
-            attr_name = f"_{attr_name}"
-        return attr_name
+        return naming.local_name(name)
 
     def get_remote_attribute_name(self, name: str) -> str:
         """Get remote attribute name
@@ -501,17 +537,13 @@ class TypeManager:
         """Get the localized model type name"""
         if not model_ref:
             return "Request"
-        name = "".join(
-            x.capitalize()
-            for x in re.split(common.SPLIT_NAME_RE, model_ref.name)
-        )
-        return name
+        return self.lowered.get_name(model_ref.name)
 
     def _get_adt_by_reference(self, model_ref):
-        for model_ in self.models:
-            if model_.reference == model_ref:
-                return model_
-        raise RuntimeError("Cannot find reference %s" % model_ref)
+        try:
+            return self.models_by_reference[model_ref]
+        except KeyError:
+            raise RuntimeError("Cannot find reference %s" % model_ref)
 
     def convert_model(
         self,
@@ -534,7 +566,7 @@ class TypeManager:
             xtyp = self.primitive_type_mapping.get(type_model.__class__)
             if not xtyp:
                 raise RuntimeError("No mapping for %s" % type_model)
-            return xtyp(**type_model.model_dump())
+            return self._convert_primitive(xtyp, type_model)
 
         # Composite/Compound type
         if model_ref and model_ref in self.refs:
@@ -558,54 +590,26 @@ class TypeManager:
                 item_type=self.convert_model(type_model.item_type)
             )
         elif isinstance(type_model, model.Enum):
-            if len(type_model.base_types) > 1:
-                if model.PrimitiveBoolean in type_model.base_types:
-                    # enum literals supporting also bools are most likely
-                    # bool + string -> just keep bool on the Rust side
-                    typ = Boolean()
-                else:
-                    raise RuntimeError(
-                        f"Rust model does not support multitype enums yet {type_model}"
+            base_type = self.lowered.get_enum_type(type_model)
+            if base_type is model.ConstraintString:
+                try:
+                    # TODO(gtema): make parent nullable or add "null"
+                    # as enum value
+                    typ = self.string_enum_class(
+                        name=self.get_model_name(type_model.reference),
+                        variants=self.lowered.get_enum_variants(type_model),
                     )
-            elif len(type_model.base_types) == 1:
-                base_type = type_model.base_types[0]
-                if base_type is model.ConstraintString:
-                    variants: dict[str, set[str]] = {}
-                    try:
-                        if None in type_model.literals:
-                            # TODO(gtema): make parent nullable or add "null"
-                            # as enum value
-                            type_model.literals.remove(None)
-                        for lit in set(x.lower() for x in type_model.literals):
-                            val = "".join(
-                                [
-                                    x.capitalize()
-                                    for x in re.split(
-                                        common.SPLIT_NAME_RE, lit
-                                    )
-                                ]
-                            )
-                            if val and val[0].isdigit():
-                                val = "_" + val
-                            vals = variants.setdefault(val, set())
-                            for orig_val in type_model.literals:
-                                if orig_val.lower() == lit:
-                                    vals.add(orig_val)
-
-                        typ = self.string_enum_class(
-                            name=self.get_model_name(type_model.reference),
-                            variants=variants,
-                        )
-                    except Exception:
-                        logging.exception(
-                            "Error processing enum: %s", type_model
-                        )
-                elif base_type is model.ConstraintInteger:
-                    typ = self.primitive_type_mapping[
-                        model.ConstraintInteger
-                    ]()
-                elif base_type is model.PrimitiveBoolean:
-                    typ = self.primitive_type_mapping[model.PrimitiveBoolean]()
+                except Exception:
+                    logging.exception("Error processing enum: %s", type_model)
+            elif base_type in [
+                model.ConstraintInteger,
+                model.PrimitiveBoolean,
+            ]:
+                typ = self.primitive_type_mapping[base_type]()
+            elif len(type_model.base_types) > 1:
+                raise RuntimeError(
+                    f"Rust model does not support multitype enums yet {type_model}"
+                )
 
         if not typ:
             raise RuntimeError(
@@ -615,7 +619,65 @@ class TypeManager:
 
         if not model_ref:
             model_ref = model.Reference(name="Body", type=typ.__class__)
+        self._set_ref(model_ref, typ)
+        return typ
+
+    def _set_ref(
+        self,
+        model_ref: model.Reference,
+        typ: BasePrimitiveType | BaseCombinedType | BaseCompoundType,
+    ) -> None:
+        """Save converted type of the model reference"""
+        previous = self.refs.get(model_ref)
+        if isinstance(previous, Struct) and previous is not typ:
+            same_named = self._structs_by_name.get(previous.name, [])
+            if previous in same_named:
+                same_named.remove(previous)
         self.refs[model_ref] = typ
+        if isinstance(typ, Struct) and typ.name:
+            self._structs_by_name.setdefault(typ.name, []).append(typ)
+
+    def _rename_model(
+        self,
+        data_type: BaseCompoundType,
+        new_name: str,
+    ) -> None:
+        """Rename converted type to resolve the name conflict"""
+        old_name = data_type.name
+        if old_name == new_name:
+            return
+        logging.info(
+            "Renaming %s to %s due to the name conflict", old_name, new_name
+        )
+        self.model_renames.append((old_name, new_name))
+        if isinstance(data_type, Struct):
+            same_named = self._structs_by_name.get(old_name, [])
+            if data_type in same_named:
+                same_named.remove(data_type)
+            self._structs_by_name.setdefault(new_name, []).append(data_type)
+        data_type.name = new_name
+
+    def _convert_primitive(
+        self,
+        xtyp: Type[BasePrimitiveType] | Type[BaseCombinedType],
+        type_model: model.PrimitiveType,
+    ) -> BasePrimitiveType | BaseCombinedType:
+        """Convert primitive data type
+
+        Result depends only on the target class and the (immutable)
+        primitive, so identical conversions share a single instance. It must
+        therefore not be modified.
+        """
+        key = (xtyp, type_model)
+        try:
+            typ = self._primitive_types_cache.get(key)
+        except TypeError:
+            # Primitive with unhashable attributes (i.e. `enum`)
+            return xtyp(**type_model.model_dump())
+        if typ is None:
+            typ = self._primitive_types_cache.setdefault(
+                key, xtyp(**type_model.model_dump())
+            )
         return typ
 
     def _get_array_type(self, type_model: model.Array) -> Array:
@@ -630,13 +692,11 @@ class TypeManager:
     ) -> BaseCompoundType | BaseCombinedType | BasePrimitiveType:
         """Convert `model.OneOfType` into Rust model"""
         kinds: list[dict] = []
-        is_nullable: bool = False
+        lowered = self.lowered.get_one_of(type_model)
+        # null is not a candidate. Instead result is wrapped with Option
+        is_nullable: bool = lowered.is_nullable
         result_data_type = None
-        for kind in type_model.kinds:
-            if isinstance(kind, model.PrimitiveNull):
-                # Remove null from candidates and instead wrap with Option
-                is_nullable = True
-                continue
+        for kind in lowered.kinds:
             kind_type = self.convert_model(kind)
             is_type_already_present = False
             for processed_kind_type in kinds:
@@ -756,80 +816,90 @@ class TypeManager:
                 mod.additional_fields_type = self.convert_model(definition)
         return mod
 
+    def _get_oneof_kind_name(self, kind: dict) -> str | None:
+        """Get name of the converted oneOf kind known to the lowering"""
+        for name, klass in [
+            ("string", self.primitive_type_mapping[model.ConstraintString]),
+            ("number", self.primitive_type_mapping[model.ConstraintNumber]),
+            ("integer", self.primitive_type_mapping[model.ConstraintInteger]),
+            ("boolean", self.primitive_type_mapping[model.PrimitiveBoolean]),
+            ("object", self.data_type_mapping[model.Dictionary]),
+        ]:
+            if kind["class"] == klass:
+                return name
+        return None
+
+    def _get_oneof_combination(
+        self, type_model, kinds
+    ) -> model.OneOfCombination | None:
+        """Get the known combination of the converted oneOf kinds"""
+        return self.lowered.get_one_of_combination(
+            type_model, [self._get_oneof_kind_name(x) for x in kinds]
+        )
+
     def _simplify_oneof_combinations(self, type_model, kinds):
         """Simplify certain known oneOf combinations"""
-        kinds_classes = [x["class"] for x in kinds]
-        string_klass = self.primitive_type_mapping[model.ConstraintString]
-        number_klass = self.primitive_type_mapping[model.ConstraintNumber]
-        integer_klass = self.primitive_type_mapping[model.ConstraintInteger]
-        boolean_klass = self.primitive_type_mapping[model.PrimitiveBoolean]
-        dict_klass = self.data_type_mapping[model.Dictionary]
-        enum_name = type_model.reference.name if type_model.reference else None
-        if string_klass in kinds_classes and number_klass in kinds_classes:
-            # oneOf [string, number] => string
-            for typ in list(kinds):
-                if typ["class"] == number_klass:
-                    kinds.remove(typ)
-        elif string_klass in kinds_classes and integer_klass in kinds_classes:
-            if enum_name and (
-                enum_name.endswith("size") or enum_name.endswith("count")
-            ):
-                # XX_size or XX_count is clearly an integer
-                for typ in list(kinds):
-                    if typ["class"] == string_klass:
-                        kinds.remove(typ)
-            else:
-                # oneOf [string, integer] => string
-                # Reason: compute.server.flavorRef is string or integer. For
-                # simplicity keep string
-                for typ in list(kinds):
-                    if typ["class"] == integer_klass:
-                        kinds.remove(typ)
-        elif string_klass in kinds_classes and boolean_klass in kinds_classes:
-            # oneOf [string, boolean] => boolean
-            for typ in list(kinds):
-                if typ["class"] == string_klass:
-                    kinds.remove(typ)
-        elif string_klass in kinds_classes and dict_klass in kinds_classes:
-            # oneOf [string, dummy object] => JsonValue
-            # Simple string can be easily represented by JsonValue
+        combination = self._get_oneof_combination(type_model, kinds)
+        if not combination:
+            return
+        if combination.keep == "any":
             for c in kinds:
                 # Discard dict
                 self.ignored_models.append(c["model"])
             kinds.clear()
             jsonval_klass = self.primitive_type_mapping[model.PrimitiveAny]
             kinds.append({"local": jsonval_klass(), "class": jsonval_klass})
-        elif len(set(kinds_classes)) == 1 and string_klass in kinds_classes:
-            # in the output oneOf of same type (but maybe different formats)
-            # makes no sense
-            # Example is server addresses which are ipv4 or ipv6
-            bck = kinds[0].copy()
-            kinds.clear()
-            kinds.append(bck)
+        elif len(combination.kinds) == 1:
+            # All kinds are of the same type, keep first one
+            del kinds[1:]
+        else:
+            for typ in list(kinds):
+                name = self._get_oneof_kind_name(typ)
+                if name in combination.kinds and name != combination.keep:
+                    kinds.remove(typ)
 
-    def set_models(self, models):
-        """Process (translate) ADT models into Rust SDK style"""
+    def set_models(
+        self, models, lowered: model.LoweredModels | None = None
+    ) -> None:
+        """Process (translate) ADT models into Rust SDK style
+
+        :param lowered: Lowering of the models shared with other
+            TypeManagers. Computed when not given.
+        """
         self.models = models
+        self.lowered = (
+            lowered if lowered is not None else model.LoweredModels(models)
+        )
+        self.models_by_reference = {}
+        self._model_children = {}
+        for model_ in models:
+            if (
+                model_.reference
+                and model_.reference not in self.models_by_reference
+            ):
+                # First model with the reference wins
+                self.models_by_reference[model_.reference] = model_
+                self._model_children[model_.reference] = (
+                    self._get_model_children(model_)
+                )
         self.refs = {}
+        self._structs_by_name = {}
+        self.model_renames = []
         self.ignored_models = []
-        # A dictionary of model names to references to assign unique names
-        unique_models: dict[str, model.Reference] = {}
+        # Model names with references of the models to assign unique names
+        unique_models = naming.NameScope()
         for model_ in models:
             model_data_type = self.convert_model(model_)
             if not isinstance(model_data_type, BaseCompoundType):
                 continue
             name = getattr(model_data_type, "name", None)
-            if (
-                name
-                and name in unique_models
-                and unique_models[name] != model_.reference
-            ):
+            if name and unique_models.is_conflicting(name, model_.reference):
                 # There is already a model with this name. Try adding suffix from datatype name
                 new_name = name + model_data_type.__class__.__name__
                 if new_name not in unique_models:
                     # New name is still unused
-                    model_data_type.name = new_name
-                    unique_models[new_name] = model_.reference
+                    self._rename_model(model_data_type, new_name)
+                    unique_models.add(new_name, model_.reference)
                 elif isinstance(model_data_type, Struct):
                     # This is already an exceptional case (identity.mapping
                     # with remote being oneOf with multiple structs)
@@ -839,26 +909,20 @@ class TypeManager:
                         x.title() for x in props
                     ).replace("_", "")
                     if new_new_name not in unique_models:
-                        for other_ref, other_model in self.refs.items():
-                            other_name = getattr(other_model, "name", None)
-                            if not other_name:
-                                continue
-                            if other_name in [
-                                name,
-                                new_name,
-                            ] and isinstance(other_model, Struct):
-                                # rename first occurence to the same scheme
-                                props = other_model.fields.keys()
-                                new_other_name = name + "".join(
-                                    x.title() for x in props
-                                ).replace("_", "")
-                                other_model.name = new_other_name
-                                unique_models[new_other_name] = (
-                                    model_.reference
-                                )
-
-                        model_data_type.name = new_new_name
-                        unique_models[new_new_name] = model_.reference
+                        same_named = self._structs_by_name.get(
+                            name, []
+                        ) + self._structs_by_name.get(new_name, [])
+                        for other_model in same_named:
+                            # rename first occurence to the same scheme
+                            props = other_model.fields.keys()
+                            new_other_name = name + "".join(
+                                x.title() for x in props
+                            ).replace("_", "")
+                            self._rename_model(other_model, new_other_name)
+                            unique_models.add(new_other_name, model_.reference)
+
+                        self._rename_model(model_data_type, new_new_name)
+                        unique_models.add(new_new_name, model_.reference)
                     else:
                         raise RuntimeError(
                             "Model name %s is already present" % new_new_name
@@ -868,13 +932,41 @@ class TypeManager:
                         "Model name %s is already present" % new_name
                     )
             elif name:
-                unique_models[name] = model_.reference
+                unique_models.add(name, model_.reference)
 
         for ignore_model in self.ignored_models:
             self.discard_model(ignore_model)
 
+        root = self._find_root_data_type()
+        if isinstance(root, Struct) and isinstance(root.fields, dict):
+            # There might be tuple Struct (with fields as list)
+            field_names = list(root.fields.keys())
+            if (
+                len(field_names) == 1
+                and root.fields[field_names[0]].is_optional
+            ):
+                # A body with only field can not normally be optional
+                logging.warning(
+                    "Request body with single root field cannot be optional"
+                )
+                root.fields[field_names[0]].is_optional = False
+        self.invalidate_views()
+
+    def invalidate_views(self) -> None:
+        """Drop memoized derived views
+
+        Must be called whenever `refs` or `parameters` are modified directly.
+        """
+        self._views = {}
+
     def get_subtypes(self):
         """Get all subtypes excluding TLA"""
+        if "subtypes" not in self._views:
+            self._views["subtypes"] = list(self._get_subtypes())
+        return iter(self._views["subtypes"])
+
+    def _get_subtypes(self):
+        """Iterate over all subtypes excluding TLA"""
         for k, v in self.refs.items():
             if (
                 k
@@ -890,53 +982,55 @@ class TypeManager:
                 if isinstance(v.item_type, Enum):
                     yield v.item_type
 
-    def get_root_data_type(self):
-        """Get TLA type"""
+    def _find_root_data_type(self):
+        """Find TLA type in the converted types"""
         for k, v in self.refs.items():
             if not k or (k.name == "Body" and isinstance(v, Struct)):
-                if isinstance(v.fields, dict):
-                    # There might be tuple Struct (with
-                    # fields as list)
-                    field_names = list(v.fields.keys())
-                    if (
-                        len(field_names) == 1
-                        and v.fields[field_names[0]].is_optional
-                    ):
-                        # A body with only field can not normally be optional
-                        logging.warning(
-                            "Request body with single root field cannot be optional"
-                        )
-                        v.fields[field_names[0]].is_optional = False
                 return v
             elif not k or (k.name == "Body" and isinstance(v, Dictionary)):
                 # Response is a free style Dictionary
                 return v
-        # No root has been found, make a dummy one
-        root = self.data_type_mapping[model.Struct](name="Request")
-        return root
+        return None
+
+    def get_root_data_type(self):
+        """Get TLA type"""
+        if "root" not in self._views:
+            root = self._find_root_data_type()
+            if root is None:
+                # No root has been found, make a dummy one
+                root = self.data_type_mapping[model.Struct](name="Request")
+            self._views["root"] = root
+        return self._views["root"]
 
     def get_imports(self):
         """Get complete set of additional imports required by all models in scope"""
-        imports: set[str] = set()
-        imports.update(self.get_root_data_type().imports)
-        for subt in self.get_subtypes():
-            imports.update(subt.imports)
-            # for item in self.refs.values():
-            #     imports.update(item.imports)
-        for param in self.parameters.values():
-            imports.update(param.data_type.imports)
-        return imports
+        if "imports" not in self._views:
+            imports: set[str] = set()
+            imports.update(self.get_root_data_type().imports)
+            for subt in self.get_subtypes():
+                imports.update(subt.imports)
+                # for item in self.refs.values():
+                #     imports.update(item.imports)
+            for param in self.parameters.values():
+                imports.update(param.data_type.imports)
+            self._views["imports"] = imports
+        return set(self._views["imports"])
 
     def get_request_static_lifetimes(self, request_model: Struct):
         """Return static lifetimes of the Structure"""
-        lifetimes = request_model.lifetimes
-        for param in self.parameters.values():
-            lt = param.lifetimes
-            if lt:
-                lifetimes.update(lt)
-        if lifetimes:
-            return f"<{', '.join(lifetimes)}>"
-        return ""
+        key = ("lifetimes", id(request_model))
+        if key not in self._views:
+            lifetimes = request_model.lifetimes
+            for param in self.parameters.values():
+                lt = param.lifetimes
+                if lt:
+                    lifetimes.update(lt)
+            # Keep the model in the cache to prevent reuse of its id
+            self._views[key] = (
+                request_model,
+                f"<{', '.join(lifetimes)}>" if lifetimes else "",
+            )
+        return self._views[key][1]
 
     def subtype_requires_private_builders(self, subtype) -> bool:
         """Return `True` if type require private builder"""
@@ -963,6 +1057,47 @@ class TypeManager:
                 is_flag=parameter.is_flag,
             )
             self.parameters[param.local_name] = param
+        self.invalidate_views()
+
+    def get_model_digest(self, data_type: BaseModel) -> bytes:
+        """Get digest of the type for the template fragment cache
+
+        The digest is computed once per type and reused also for the types
+        nesting it as long as the models are not modified.
+        """
+        digests = self._views.setdefault("digests", {})
+        if id(data_type) not in digests:
+            # Keep the model in the cache to prevent reuse of its id
+            digests[id(data_type)] = (
+                data_type,
+                get_model_digest(data_type, digests),
+            )
+        return digests[id(data_type)][1]
+
+    def get_structural_key(self) -> Any:
+        """Get key of the type manager for the template fragment cache
+
+        Rendering of the types only depends on the class of the type manager
+        (the target specific type mappings).
+        """
+        return type(self)
+
+    def fork(self: TypeManagerT) -> TypeManagerT:
+        """Get new TypeManager of the same type with the same parameters
+
+        Operation parameters are identical for every operation variant.
+        Instead of converting them for every variant again convert them once
+        in the prototype and fork it for every variant. Converted parameters
+        are shared between forks and must not be modified.
+        """
+        new = self.__class__()
+        new.parameters = dict(self.parameters)
+        new.refs = dict(self.refs)
+        new._structs_by_name = {
+            k: list(v) for k, v in self._structs_by_name.items()
+        }
+        new.lowered = self.lowered
+        return new
 
     def get_parameters(
         self, location: str
@@ -976,56 +1111,62 @@ class TypeManager:
         self,
         type_model: model.PrimitiveType | model.ADT | model.Reference,
     ):
-        """Discard model from the manager"""
+        """Discard model from the manager
+
+        Types of struct fields, oneOf kinds and array items of the discarded
+        model are discarded as well (cascading).
+        """
         logging.debug(f"Request to discard {type_model}")
         if isinstance(type_model, model.Reference):
             type_model = self._get_adt_by_reference(type_model)
         if not hasattr(type_model, "reference"):
             return
-        for ref, data in list(self.refs.items()):
-            if ref == type_model.reference:
-                sub_ref: model.Reference | None = None
-                if ref.type == model.Struct:
-                    logging.debug(
-                        "Element is a struct. Purging also field types"
-                    )
-                    # For struct type we cascadely discard all field types as
-                    # well
-                    for v in type_model.fields.values():
-                        if isinstance(v.data_type, model.Reference):
-                            sub_ref = v.data_type
-                        else:
-                            sub_ref = getattr(v.data_type, "reference", None)
-                        if sub_ref:
-                            logging.debug(f"Need to purge also {sub_ref}")
-                            self.discard_model(sub_ref)
-                elif ref.type == model.OneOfType:
-                    logging.debug(
-                        "Element is a OneOf. Purging also kinds types"
-                    )
-                    for v in type_model.kinds:
-                        if isinstance(v, model.Reference):
-                            sub_ref = v
-                        else:
-                            sub_ref = getattr(v, "reference", None)
-                        if sub_ref:
-                            logging.debug(f"Need to purge also {sub_ref}")
-                            self.discard_model(sub_ref)
-                elif ref.type == model.Array:
-                    logging.debug(
-                        f"Element is a Array. Purging also item type {type_model.item_type}"
-                    )
-                    if isinstance(type_model.item_type, model.Reference):
-                        sub_ref = type_model.item_type
-                    else:
-                        sub_ref = getattr(
-                            type_model.item_type, "reference", None
-                        )
-                    if sub_ref:
-                        logging.debug(f"Need to purge also {sub_ref}")
-                        self.discard_model(sub_ref)
+        if type_model.reference not in self.refs:
+            return
+        # Walk the dependency graph discarding children before the parents
+        stack: list[tuple[model.Reference, bool]] = [
+            (type_model.reference, False)
+        ]
+        visited: set[model.Reference] = set()
+        while stack:
+            ref, children_done = stack.pop()
+            if children_done:
                 logging.debug(f"Purging {ref} from models")
                 self.refs.pop(ref, None)
+                continue
+            if ref in visited or ref not in self.refs:
+                continue
+            visited.add(ref)
+            stack.append((ref, True))
+            for sub_ref in reversed(self._model_children.get(ref, [])):
+                logging.debug(f"Need to purge also {sub_ref}")
+                stack.append((sub_ref, False))
+        self.invalidate_views()
+
+    @staticmethod
+    def _get_model_children(type_model: model.ADT) -> list[model.Reference]:
+        """Get references of the types directly used by the model
+
+        Only struct fields, oneOf kinds and array items are considered.
+        """
+        children: list[model.PrimitiveType | model.ADT | model.Reference]
+        if isinstance(type_model, model.Struct):
+            children = [x.data_type for x in type_model.fields.values()]
+        elif isinstance(type_model, model.OneOfType):
+            children = list(type_model.kinds)
+        elif isinstance(type_model, model.Array):
+            children = [type_model.item_type]
+        else:
+            return []
+        result: list[model.Reference] = []
+        for child in children:
+            if isinstance(child, model.Reference):
+                result.append(child)
+            else:
+                sub_ref = getattr(child, "reference", None)
+                if sub_ref:
+                    result.append(sub_ref)
+        return result
 
     def is_operation_supporting_params(self) -> bool:
         """Determine whether operation supports any sort of parameters"""
@@ -1044,6 +1185,7 @@ class TypeManager:
         return False
 
 
+@functools.lru_cache(maxsize=4096)
 def sanitize_rust_docstrings(doc: str | None) -> str | None:
     """Sanitize the string to be a valid rust docstring"""
     if not doc:
@@ -0,0 +1,47 @@
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+"""Custom commands of the package build (registered in `setup.cfg`)"""
+import logging
+from pathlib import Path
+
+from setuptools.command import build_py
+
+
+class BuildPy(build_py.build_py):
+    """Build command precompiling the templates into the built package
+
+    Modules are written into the build directory next to the copied
+    templates and are therefore shipped with the package. Build
+    dependencies (see `pyproject.toml`) provide the template engine. Without
+    them the package is built without the modules and the templates are
+    compiled on first use instead.
+    """
+
+    command_name = "build_py"
+
+    def run(self):
+        super().run()
+        if not self.dry_run:
+            compile_templates(Path(self.build_lib))
+
+
+def compile_templates(build_lib: Path) -> None:
+    """Precompile templates into the package in the build directory"""
+    try:
+        from codegenerator import base
+    except ImportError as ex:
+        logging.warning("Templates are not precompiled: %s", ex)
+        return
+    base.compile_templates(
+        Path(build_lib, "codegenerator", base.COMPILED_TEMPLATES_DIR.name)
+    )
@@ -21,6 +21,8 @@ from codegenerator.common.schema import TypeSchema
 class JsonSchemaGenerator(BaseGenerator):
     """Generate jsonschema from the SDK resource"""
 
+    supports_output_sink = False
+
     def __init__(self):
         super().__init__()
 
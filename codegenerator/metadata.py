@@ -12,13 +12,13 @@
 #
 from pathlib import Path
 import logging
-import re
 
 import jsonref
 from ruamel.yaml import YAML
 
 from codegenerator.base import BaseGenerator
 from codegenerator import common
+from codegenerator.common import naming
 from codegenerator.common.schema import SpecSchema
 from codegenerator.types import Metadata
 from codegenerator.types import OperationModel
@@ -29,6 +29,8 @@ from codegenerator.types import ResourceModel
 class MetadataGenerator(BaseGenerator):
     """Generate metadata from OpenAPI spec"""
 
+    supports_output_sink = False
+
     def load_openapi(self, path):
         """Load existing OpenAPI spec from the file"""
         if not path.exists():
@@ -348,12 +350,9 @@ class MetadataGenerator(BaseGenerator):
                                         )
                                         continue
 
-                                    operation_name = "-".join(
-                                        x.lower()
-                                        for x in re.split(
-                                            common.SPLIT_NAME_RE, action_name
-                                        )
-                                    ).lower()
+                                    operation_name = naming.snake_case(
+                                        action_name, "-"
+                                    )
                                     rust_sdk_params = (
                                         get_rust_sdk_operation_args(
                                             "action",
@@ -650,7 +649,7 @@ def get_module_name(name):
         return "create"
     elif name in ["default"]:
         return "default"
-    return "_".join(x.lower() for x in re.split(common.SPLIT_NAME_RE, name))
+    return naming.snake_case(name)
 
 
 def post_process_operation(
@@ -19,18 +19,64 @@ from typing import Type
 import typing as ty
 
 from pydantic import BaseModel
+from pydantic import ConfigDict
 
 from codegenerator import common
+from codegenerator.common import naming
 
 
 def dicthash_(data: dict[str, Any]) -> str:
     """Calculate hash of the dictionary"""
     dh = hashlib.md5()
-    encoded = json.dumps(data, sort_keys=True).encode()
+    try:
+        encoded = json.dumps(data, sort_keys=True).encode()
+    except RecursionError:
+        # Schema is nested deeper than json encoder is able to process
+        encoded = _json_dumps_iterative(data).encode()
     dh.update(encoded)
     return dh.hexdigest()
 
 
+def _json_dumps_iterative(data: Any) -> str:
+    """Serialize data as `json.dumps(data, sort_keys=True)` without recursion"""
+    chunks: list[str] = []
+    # Stack of (is_literal, item) entries
+    stack: list[tuple[bool, Any]] = [(False, data)]
+    while stack:
+        (is_literal, item) = stack.pop()
+        if is_literal:
+            chunks.append(item)
+        elif isinstance(item, dict):
+            if not item:
+                chunks.append("{}")
+                continue
+            chunks.append("{")
+            pieces: list[tuple[bool, Any]] = []
+            for idx, (key, value) in enumerate(sorted(item.items())):
+                if not isinstance(key, str):
+                    key = json.dumps(key)
+                prefix = ", " if idx else ""
+                pieces.append((True, f"{prefix}{json.dumps(key)}: "))
+                pieces.append((False, value))
+            pieces.append((True, "}"))
+            stack.extend(reversed(pieces))
+        elif isinstance(item, (list, tuple)):
+            if not item:
+                chunks.append("[]")
+                continue
+            chunks.append("[")
+            pieces = []
+            for idx, value in enumerate(item):
+                if idx:
+                    pieces.append((True, ", "))
+                pieces.append((False, value))
+            pieces.append((True, "]"))
+            stack.extend(reversed(pieces))
+        else:
+            chunks.append(json.dumps(item))
+    return "".join(chunks)
+
+
 class Reference(BaseModel):
     """Reference of the complex type to the occurence instance"""
 
@@ -44,9 +90,13 @@ class Reference(BaseModel):
 
 
 class PrimitiveType(BaseModel):
-    """Primitive Data Type stricture"""
+    """Primitive Data Type stricture
 
-    pass
+    Primitives are immutable. Use `get_primitive_type` to get the shared
+    instance of the primitive.
+    """
+
+    model_config = ConfigDict(frozen=True)
 
 
 class PrimitiveString(PrimitiveType):
@@ -89,12 +139,47 @@ class PrimitiveAny(PrimitiveType):
     pass
 
 
+#: Canonical instances of the primitive types
+_primitive_types: dict[tuple, PrimitiveType] = {}
+
+
+def get_primitive_type(cls: Type[PrimitiveType], **kwargs) -> PrimitiveType:
+    """Get canonical instance of the primitive type
+
+    Identical primitives share a single instance. Like with the direct
+    instantiation of the class attributes not known to the class (i.e.
+    `description` of the schema) are ignored.
+
+    :param cls: Primitive type class.
+    :param kwargs: Attributes of the primitive.
+    """
+    # Values are qualified with the type since i.e. `1 == 1.0 == True`
+    key = (
+        cls,
+        *(
+            (type(kwargs.get(x)), kwargs.get(x))
+            for x in cls.model_fields
+            if x in kwargs
+        ),
+    )
+    try:
+        obj = _primitive_types.get(key)
+    except TypeError:
+        # Unhashable attribute values (i.e. `enum`) - no canonical instance
+        return cls(**kwargs)
+    if obj is None:
+        obj = _primitive_types.setdefault(key, cls(**kwargs))
+    return obj
+
+
 class ADT(BaseModel):
     """Abstract Data Type / Composite - typically sort of
     collection of Primitives"""
 
     reference: Reference | None = None
     description: str | None = None
+    #: Type is only used by `readOnly` properties
+    is_read_only: bool = False
 
 
 class AbstractList(ADT):
@@ -134,6 +219,7 @@ class StructField(BaseModel):
     data_type: PrimitiveType | ADT | Reference
     description: str | None = None
     is_required: bool = False
+    is_read_only: bool = False
     min_ver: str | None = None
     max_ver: str | None = None
 
@@ -170,8 +256,191 @@ class Set(AbstractList):
     pass
 
 
+class LoweredOneOf(BaseModel):
+    """OneOf with the target independent simplifications applied"""
+
+    #: Kinds of the oneOf excluding `null` and duplicated primitive types
+    kinds: list[PrimitiveType | ADT | Reference] = []
+    #: Whether `null` is one of the kinds
+    is_nullable: bool = False
+
+
+class OneOfCombination(BaseModel):
+    """Known combination of the oneOf kinds and its simplification
+
+    Kinds are named by the type they are represented with by the target:
+    `string`, `number`, `integer`, `boolean` or `object`.
+    """
+
+    #: Names of the kinds forming the combination
+    kinds: frozenset[str]
+    #: Name of the kind to keep or `any` when the oneOf is to be replaced
+    #: by an arbitrary value
+    keep: str
+
+
+class LoweredModels:
+    """Target independent lowering of the ADT models
+
+    Captures decisions every generator takes the same way for the models of
+    the operation: type names, unwrapping of `null` and deduplication of the
+    oneOf kinds, simplification of the known oneOf combinations, types of
+    the enums and variants of the string enums. TypeManagers only apply
+    their target specific mapping on top of it, so that multiple
+    TypeManagers processing same models (request and response of the
+    operation, SDK and CLI) share the work.
+
+    Lowering of models not known upfront (i.e. parameters) is done on demand.
+    """
+
+    def __init__(self, models: list[ADT] | None = None):
+        # Results by the ADT identity. ADT is kept as well to guarantee
+        # the identity is not reused.
+        self._one_of: dict[int, tuple[OneOfType, LoweredOneOf]] = {}
+        self._enum_variants: dict[int, tuple[Enum, dict[str, set[str]]]] = {}
+        self._combinations: dict[
+            tuple[int, tuple[str | None, ...]],
+            tuple[OneOfType, OneOfCombination | None],
+        ] = {}
+        for model_ in models or []:
+            if isinstance(model_, OneOfType):
+                self.get_one_of(model_)
+            elif (
+                isinstance(model_, Enum)
+                and self.get_enum_type(model_) is ConstraintString
+            ):
+                self.get_enum_variants(model_)
+
+    def get_name(self, name: str) -> str:
+        """Get the CamelCase type name for the reference name"""
+        return naming.camel_case(name)
+
+    def get_one_of(self, type_model: OneOfType) -> LoweredOneOf:
+        """Get oneOf kinds without `null` and duplicated primitive types
+
+        Other kinds are kept even when duplicated, since they may still be
+        represented differently by the target.
+        """
+        cached = self._one_of.get(id(type_model))
+        if cached is not None:
+            return cached[1]
+        result = LoweredOneOf()
+        for kind in type_model.kinds:
+            if isinstance(kind, PrimitiveNull):
+                result.is_nullable = True
+            elif not isinstance(kind, PrimitiveType) or (
+                kind not in result.kinds
+            ):
+                result.kinds.append(kind)
+        self._one_of[id(type_model)] = (type_model, result)
+        return result
+
+    def get_one_of_combination(
+        self, type_model: OneOfType, kinds: list[str | None]
+    ) -> OneOfCombination | None:
+        """Get the known combination of the oneOf kinds
+
+        :param type_model: The oneOf model.
+        :param kinds: Names of the kinds as represented by the target
+            (`None` for kinds not participating in any combination).
+        """
+        key = (id(type_model), tuple(kinds))
+        cached = self._combinations.get(key)
+        if cached is not None:
+            return cached[1]
+        present = set(kinds)
+        name = type_model.reference.name if type_model.reference else None
+        keep: str | None = None
+        if {"string", "number"} <= present:
+            # oneOf [string, number] => string
+            keep = "string"
+            present = {"string", "number"}
+        elif {"string", "integer"} <= present:
+            present = {"string", "integer"}
+            if name and (name.endswith("size") or name.endswith("count")):
+                # XX_size or XX_count is clearly an integer
+                keep = "integer"
+            else:
+                # oneOf [string, integer] => string
+                # Reason: compute.server.flavorRef is string or integer. For
+                # simplicity keep string
+                keep = "string"
+        elif {"string", "boolean"} <= present:
+            # oneOf [string, boolean] => boolean
+            keep = "boolean"
+            present = {"string", "boolean"}
+        elif {"string", "object"} <= present:
+            # oneOf [string, dummy object] => any
+            # Simple string can be easily represented by arbitrary value
+            keep = "any"
+            present = {"string", "object"}
+        elif present == {"string"}:
+            # oneOf of same type (but maybe different formats) makes no
+            # sense. Example is server addresses which are ipv4 or ipv6
+            keep = "string"
+        result = (
+            OneOfCombination(kinds=frozenset(present), keep=keep)
+            if keep
+            else None
+        )
+        self._combinations[key] = (type_model, result)
+        return result
+
+    def get_enum_type(self, type_model: Enum) -> Type[PrimitiveType] | None:
+        """Get the primitive type the enum is represented with
+
+        `None` is returned for the multitype enums not having any.
+        """
+        if len(type_model.base_types) > 1:
+            if PrimitiveBoolean in type_model.base_types:
+                # enum literals supporting also bools are most likely
+                # bool + string -> just keep bool
+                return PrimitiveBoolean
+            return None
+        elif type_model.base_types:
+            return type_model.base_types[0]
+        return None
+
+    def get_enum_variants(self, type_model: Enum) -> dict[str, set[str]]:
+        """Get variant names of the string enum with matching literals
+
+        Literals differing only in case are grouped into single variant.
+        `null` literal is ignored.
+        """
+        cached = self._enum_variants.get(id(type_model))
+        if cached is not None:
+            return cached[1]
+        literals = [x for x in type_model.literals if x is not None]
+        variants: dict[str, set[str]] = {}
+        for lit in set(x.lower() for x in literals):
+            val = self.get_name(lit)
+            if val and val[0].isdigit():
+                val = "_" + val
+            vals = variants.setdefault(val, set())
+            for orig_val in literals:
+                if orig_val.lower() == lit:
+                    vals.add(orig_val)
+        self._enum_variants[id(type_model)] = (type_model, variants)
+        return variants
+
+
 class JsonSchemaParser:
-    """JsonSchema to internal DataModel converter"""
+    """JsonSchema to internal DataModel converter
+
+    Parsing of the nested schemas is implemented by generator methods
+    (`_parse_*`) which instead of calling each other directly yield a
+    request `(method, schema, kwargs)` to parse a subschema and receive the
+    result back. The requests are processed using an explicit stack of
+    generators (default), which does not depend on the Python recursion
+    limit and is suitable for very deeply nested schemas, or recursively when
+    `iterative` is unset. Both modes produce identical results.
+
+    :param bool iterative: Use explicit stack instead of recursion to
+        traverse the schema (default).
+    """
+
+    def __init__(self, iterative: bool = True):
+        self.iterative = iterative
 
     def parse(
         self, schema, ignore_read_only: bool = False
@@ -183,6 +452,39 @@ class JsonSchemaParser:
         )
         return (res, results)
 
+    def _traverse(self, parser: ty.Generator, results: list[ADT]):
+        """Drive the parser generator until it produces the result"""
+        if self.iterative:
+            return self._traverse_iterative(parser, results)
+        return self._traverse_recursive(parser, results)
+
+    def _traverse_recursive(self, parser: ty.Generator, results: list[ADT]):
+        """Process subschema requests of the parser recursively"""
+        value = None
+        while True:
+            try:
+                (method, schema, kwargs) = parser.send(value)
+            except StopIteration as ex:
+                return ex.value
+            value = self._traverse_recursive(
+                method(schema, results, **kwargs), results
+            )
+
+    def _traverse_iterative(self, parser: ty.Generator, results: list[ADT]):
+        """Process subschema requests of the parser with an explicit stack"""
+        stack: list[ty.Generator] = [parser]
+        value = None
+        while stack:
+            try:
+                (method, schema, kwargs) = stack[-1].send(value)
+            except StopIteration as ex:
+                stack.pop()
+                value = ex.value
+                continue
+            stack.append(method(schema, results, **kwargs))
+            value = None
+        return value
+
     def parse_schema(
         self,
         schema,
@@ -192,97 +494,172 @@ class JsonSchemaParser:
         min_ver: str | None = None,
         max_ver: str | None = None,
         ignore_read_only: bool | None = False,
+        read_only: bool = False,
     ) -> PrimitiveType | ADT:
-        type_ = schema.get("type")
-        if "enum" in schema:
-            return self.parse_enum(
+        return self._traverse(
+            self._parse_schema(
                 schema,
                 results,
                 name=name,
                 parent_name=parent_name,
+                min_ver=min_ver,
+                max_ver=max_ver,
                 ignore_read_only=ignore_read_only,
-            )
-        if isinstance(type_, list):
-            return self.parse_typelist(
+                read_only=read_only,
+            ),
+            results,
+        )
+
+    def parse_object(self, schema, results: list[ADT], **kwargs):
+        """Parse `object` schema"""
+        return self._traverse(
+            self._parse_object(schema, results, **kwargs), results
+        )
+
+    def parse_oneOf(self, schema, results: list[ADT], **kwargs):
+        """Parse `oneOf` schema"""
+        return self._traverse(
+            self._parse_oneOf(schema, results, **kwargs), results
+        )
+
+    def parse_typelist(self, schema, results: list[ADT], **kwargs):
+        """Parse schema with list of types"""
+        return self._traverse(
+            self._parse_typelist(schema, results, **kwargs), results
+        )
+
+    def parse_array(self, schema, results: list[ADT], **kwargs):
+        """Parse `array` schema"""
+        return self._traverse(
+            self._parse_array(schema, results, **kwargs), results
+        )
+
+    def parse_allOf(self, schema, results: list[ADT], **kwargs):
+        """Parse `allOf` schema"""
+        return self._traverse(
+            self._parse_allOf(schema, results, **kwargs), results
+        )
+
+    def _parse_schema(
+        self,
+        schema,
+        results: list[ADT],
+        name: str | None = None,
+        parent_name: str | None = None,
+        min_ver: str | None = None,
+        max_ver: str | None = None,
+        ignore_read_only: bool | None = False,
+        read_only: bool = False,
+    ) -> ty.Generator[ty.Any, ty.Any, PrimitiveType | ADT]:
+        type_ = schema.get("type")
+        if "enum" in schema:
+            return self.parse_enum(
                 schema,
                 results,
                 name=name,
                 parent_name=parent_name,
                 ignore_read_only=ignore_read_only,
+                read_only=read_only,
             )
-        if isinstance(type_, str):
-            if type_ == "object":
-                return self.parse_object(
+        if isinstance(type_, list):
+            return (
+                yield from self._parse_typelist(
                     schema,
                     results,
                     name=name,
                     parent_name=parent_name,
-                    min_ver=min_ver,
-                    max_ver=max_ver,
                     ignore_read_only=ignore_read_only,
+                    read_only=read_only,
+                )
+            )
+        if isinstance(type_, str):
+            if type_ == "object":
+                return (
+                    yield from self._parse_object(
+                        schema,
+                        results,
+                        name=name,
+                        parent_name=parent_name,
+                        min_ver=min_ver,
+                        max_ver=max_ver,
+                        ignore_read_only=ignore_read_only,
+                        read_only=read_only,
+                    )
                 )
             if type_ == "array":
-                return self.parse_array(
-                    schema,
-                    results,
-                    name=name,
-                    parent_name=parent_name,
-                    ignore_read_only=ignore_read_only,
+                return (
+                    yield from self._parse_array(
+                        schema,
+                        results,
+                        name=name,
+                        parent_name=parent_name,
+                        ignore_read_only=ignore_read_only,
+                        read_only=read_only,
+                    )
                 )
             if type_ == "string":
-                obj = ConstraintString(**schema)
+                obj = get_primitive_type(ConstraintString, **schema)
                 # todo: set obj props
                 return obj
             if type_ == "integer":
-                obj = ConstraintInteger(**schema)
+                obj = get_primitive_type(ConstraintInteger, **schema)
                 # todo: set obj props
                 return obj
             if type_ == "number":
-                obj = ConstraintNumber(**schema)
+                obj = get_primitive_type(ConstraintNumber, **schema)
                 # todo: set obj props
                 return obj
             if type_ == "boolean":
-                obj = PrimitiveBoolean()
+                obj = get_primitive_type(PrimitiveBoolean)
                 # todo: set obj props
                 return obj
             if type_ == "null":
-                obj = PrimitiveNull()
+                obj = get_primitive_type(PrimitiveNull)
                 return obj
         if "oneOf" in schema:
-            return self.parse_oneOf(
-                schema,
-                results,
-                name=name,
-                parent_name=parent_name,
-                ignore_read_only=ignore_read_only,
+            return (
+                yield from self._parse_oneOf(
+                    schema,
+                    results,
+                    name=name,
+                    parent_name=parent_name,
+                    ignore_read_only=ignore_read_only,
+                    read_only=read_only,
+                )
             )
         if "allOf" in schema:
-            return self.parse_allOf(
-                schema,
-                results,
-                name=name,
-                parent_name=parent_name,
-                ignore_read_only=ignore_read_only,
+            return (
+                yield from self._parse_allOf(
+                    schema,
+                    results,
+                    name=name,
+                    parent_name=parent_name,
+                    ignore_read_only=ignore_read_only,
+                    read_only=read_only,
+                )
             )
         if not type_ and "properties" in schema:
             # Sometimes services forget to set "type=object"
-            return self.parse_object(
-                schema,
-                results,
-                name=name,
-                parent_name=parent_name,
-                min_ver=min_ver,
-                max_ver=max_ver,
-                ignore_read_only=ignore_read_only,
+            return (
+                yield from self._parse_object(
+                    schema,
+                    results,
+                    name=name,
+                    parent_name=parent_name,
+                    min_ver=min_ver,
+                    max_ver=max_ver,
+                    ignore_read_only=ignore_read_only,
+                    read_only=read_only,
+                )
             )
         if schema == {}:
             # `{}` is `Any` according to jsonschema
-            return PrimitiveAny()
+            return get_primitive_type(PrimitiveAny)
         if not type_ and "format" in schema:
-            return ConstraintString(**schema)
+            return get_primitive_type(ConstraintString, **schema)
         raise RuntimeError("Cannot determine type for %s", schema)
 
-    def parse_object(
+    def _parse_object(
         self,
         schema,
         results: list[ADT],
@@ -291,6 +668,7 @@ class JsonSchemaParser:
         min_ver: str | None = None,
         max_ver: str | None = None,
         ignore_read_only: bool | None = False,
+        read_only: bool = False,
     ):
         """Parse `object` schema
 
@@ -325,16 +703,20 @@ class JsonSchemaParser:
                 if k == "additionalProperties" and isinstance(v, bool):
                     # Some schemas (in keystone) are Broken
                     continue
-                if ignore_read_only and v.get("readOnly", False):
+                is_read_only = v.get("readOnly", False)
+                if ignore_read_only and is_read_only:
                     continue
-                data_type = self.parse_schema(
+                data_type = yield (
+                    self._parse_schema,
                     v,
-                    results,
-                    name=k,
-                    parent_name=name,
-                    min_ver=min_ver,
-                    max_ver=max_ver,
-                    ignore_read_only=ignore_read_only,
+                    dict(
+                        name=k,
+                        parent_name=name,
+                        min_ver=min_ver,
+                        max_ver=max_ver,
+                        ignore_read_only=ignore_read_only,
+                        read_only=read_only or is_read_only,
+                    ),
                 )
                 ref = getattr(data_type, "reference", None)
                 if ref:
@@ -347,6 +729,8 @@ class JsonSchemaParser:
                 field.description = v.get("description")
                 if k in required:
                     field.is_required = True
+                if is_read_only:
+                    field.is_read_only = True
                 if min_ver:
                     field.min_ver = min_ver
                 if max_ver:
@@ -359,27 +743,33 @@ class JsonSchemaParser:
                 isinstance(additional_properties, dict)
                 and "type" in additional_properties
             ):
-                additional_properties_type = self.parse_schema(
+                additional_properties_type = yield (
+                    self._parse_schema,
                     additional_properties,
-                    results,
-                    name=name,
-                    min_ver=min_ver,
-                    max_ver=max_ver,
-                    ignore_read_only=ignore_read_only,
+                    dict(
+                        name=name,
+                        min_ver=min_ver,
+                        max_ver=max_ver,
+                        ignore_read_only=ignore_read_only,
+                        read_only=read_only,
+                    ),
                 )
             else:
-                additional_properties_type = PrimitiveAny()
+                additional_properties_type = get_primitive_type(PrimitiveAny)
 
         if pattern_properties:
             # `"type": "object", "pattern_properties": {...}}`
             for key_pattern, value_type in pattern_properties.items():
-                type_kind: PrimitiveType | ADT = self.parse_schema(
+                type_kind: PrimitiveType | ADT = yield (
+                    self._parse_schema,
                     value_type,
-                    results,
-                    name=name,
-                    min_ver=min_ver,
-                    max_ver=max_ver,
-                    ignore_read_only=ignore_read_only,
+                    dict(
+                        name=name,
+                        min_ver=min_ver,
+                        max_ver=max_ver,
+                        ignore_read_only=ignore_read_only,
+                        read_only=read_only,
+                    ),
                 )
                 pattern_props[key_pattern] = type_kind  # type: ignore
 
@@ -405,25 +795,31 @@ class JsonSchemaParser:
             else:
                 if "oneOf" in schema:
                     # `"type": "object", "oneOf": []`
-                    return self.parse_oneOf(
-                        schema,
-                        results,
-                        name=name,
-                        parent_name=parent_name,
-                        ignore_read_only=ignore_read_only,
+                    return (
+                        yield from self._parse_oneOf(
+                            schema,
+                            results,
+                            name=name,
+                            parent_name=parent_name,
+                            ignore_read_only=ignore_read_only,
+                            read_only=read_only,
+                        )
                     )
                 elif "allOf" in schema:
                     # `"type": "object", "anyOf": []`
-                    return self.parse_allOf(
-                        schema,
-                        results,
-                        name=name,
-                        parent_name=parent_name,
-                        ignore_read_only=ignore_read_only,
+                    return (
+                        yield from self._parse_allOf(
+                            schema,
+                            results,
+                            name=name,
+                            parent_name=parent_name,
+                            ignore_read_only=ignore_read_only,
+                            read_only=read_only,
+                        )
                     )
 
                 # `{"type": "object"}`
-                obj = Dictionary(value_type=PrimitiveAny())
+                obj = Dictionary(value_type=get_primitive_type(PrimitiveAny))
         if not obj:
             raise RuntimeError("Object %s is not supported", schema)
 
@@ -463,27 +859,32 @@ class JsonSchemaParser:
                             raise NotImplementedError
                         else:
                             obj.reference.name = new_name
+            obj.is_read_only = read_only
             results.append(obj)
         return obj
 
-    def parse_oneOf(
+    def _parse_oneOf(
         self,
         schema,
         results: list[ADT],
         name: str | None = None,
         parent_name: str | None = None,
         ignore_read_only: bool | None = False,
+        read_only: bool = False,
     ):
         obj = OneOfType()
         for kind in schema.get("oneOf"):
             kind_schema = common._deep_merge(schema, kind)
             kind_schema.pop("oneOf")
             # todo: merge base props into the kind
-            kind_type = self.parse_schema(
+            kind_type = yield (
+                self._parse_schema,
                 kind_schema,
-                results,
-                name=name,
-                ignore_read_only=ignore_read_only,
+                dict(
+                    name=name,
+                    ignore_read_only=ignore_read_only,
+                    read_only=read_only,
+                ),
             )
             if not kind_type:
                 raise NotImplementedError
@@ -496,25 +897,30 @@ class JsonSchemaParser:
             obj.reference = Reference(
                 name=name, type=obj.__class__, hash_=dicthash_(schema)
             )
+        obj.is_read_only = read_only
         results.append(obj)
         return obj
 
-    def parse_typelist(
+    def _parse_typelist(
         self,
         schema,
         results: list[ADT],
         name: str | None = None,
         parent_name: str | None = None,
         ignore_read_only: bool | None = False,
+        read_only: bool = False,
     ):
         if len(schema.get("type")) == 1:
             # Bad schema with type being a list of 1 entry
             schema["type"] = schema["type"][0]
-            obj = self.parse_schema(
+            obj = yield (
+                self._parse_schema,
                 schema,
-                results,
-                name=name,
-                ignore_read_only=ignore_read_only,
+                dict(
+                    name=name,
+                    ignore_read_only=ignore_read_only,
+                    read_only=read_only,
+                ),
             )
             return obj
 
@@ -523,11 +929,14 @@ class JsonSchemaParser:
         for kind_type in schema.get("type"):
             kind_schema = copy.deepcopy(schema)
             kind_schema["type"] = kind_type
-            kind_type = self.parse_schema(
+            kind_type = yield (
+                self._parse_schema,
                 kind_schema,
-                results,
-                name=name,
-                ignore_read_only=ignore_read_only,
+                dict(
+                    name=name,
+                    ignore_read_only=ignore_read_only,
+                    read_only=read_only,
+                ),
             )
             ref = getattr(kind_type, "reference", None)
             if ref:
@@ -538,23 +947,28 @@ class JsonSchemaParser:
             obj.reference = Reference(
                 name=name, type=obj.__class__, hash_=dicthash_(schema)
             )
+        obj.is_read_only = read_only
         results.append(obj)
         return obj
 
-    def parse_array(
+    def _parse_array(
         self,
         schema,
         results: list[ADT],
         name: str | None = None,
         parent_name: str | None = None,
         ignore_read_only: bool | None = False,
+        read_only: bool = False,
     ):
         # todo: decide whether some constraints can be under items
-        item_type = self.parse_schema(
+        item_type = yield (
+            self._parse_schema,
             schema.get("items", {"type": "string"}),
-            results,
-            name=name,
-            ignore_read_only=ignore_read_only,
+            dict(
+                name=name,
+                ignore_read_only=ignore_read_only,
+                read_only=read_only,
+            ),
         )
         ref = getattr(item_type, "reference", None)
         if ref:
@@ -565,6 +979,7 @@ class JsonSchemaParser:
             obj.reference = Reference(
                 name=name, type=obj.__class__, hash_=dicthash_(schema)
             )
+        obj.is_read_only = read_only
         results.append(obj)
         return obj
 
@@ -575,6 +990,7 @@ class JsonSchemaParser:
         name: str | None = None,
         parent_name: str | None = None,
         ignore_read_only: bool | None = False,
+        read_only: bool = False,
     ):
         # todo: decide whether some constraints can be under items
         literals = schema.get("enum")
@@ -592,23 +1008,31 @@ class JsonSchemaParser:
             obj.reference = Reference(
                 name=name, type=obj.__class__, hash_=dicthash_(schema)
             )
+        obj.is_read_only = read_only
         results.append(obj)
         return obj
 
-    def parse_allOf(
+    def _parse_allOf(
         self,
         schema,
         results: list[ADT],
         name: str | None = None,
         parent_name: str | None = None,
         ignore_read_only: bool | None = False,
+        read_only: bool = False,
     ):
         sch = copy.deepcopy(schema)
         sch.pop("allOf")
         for kind in schema.get("allOf"):
             sch = common._deep_merge(sch, kind)
-        obj = self.parse_schema(
-            sch, results, name=name, ignore_read_only=ignore_read_only
+        obj = yield (
+            self._parse_schema,
+            sch,
+            dict(
+                name=name,
+                ignore_read_only=ignore_read_only,
+                read_only=read_only,
+            ),
         )
         if not obj:
             raise NotImplementedError
@@ -618,6 +1042,67 @@ class JsonSchemaParser:
         return obj
 
 
+def filter_read_only(
+    root: PrimitiveType | ADT | None, results: list[ADT]
+) -> ty.Tuple[PrimitiveType | ADT | None, list[ADT]]:
+    """Get view of the parsed data without `readOnly` properties
+
+    The view is derived from the result of the normal parsing and matches
+    what parsing with `ignore_read_only=True` would return (with exception
+    of type names that would only be different due to the name conflict
+    with the type used exclusively by the read-only property). Types not
+    containing read-only properties are shared with the original data.
+
+    :param root: Root type as returned by the parser.
+    :param results: List of types as returned by the parser.
+    :returns: Tuple of (root, results) without read-only properties
+    """
+    replaced: dict[int, ADT] = {}
+
+    def _replace(data_type):
+        return replaced.get(id(data_type), data_type)
+
+    filtered_results: list[ADT] = []
+    for obj in results:
+        if obj.is_read_only:
+            continue
+        update: dict[str, Any] = {}
+        if isinstance(obj, Struct):
+            fields: dict[str, StructField] = {}
+            fields_changed: bool = False
+            for field_name, field in obj.fields.items():
+                if field.is_read_only:
+                    fields_changed = True
+                    continue
+                data_type = _replace(field.data_type)
+                if data_type is not field.data_type:
+                    fields_changed = True
+                    field = field.model_copy(update={"data_type": data_type})
+                fields[field_name] = field
+            if fields_changed:
+                update["fields"] = fields
+            if obj.additional_fields is not None:
+                data_type = _replace(obj.additional_fields)
+                if data_type is not obj.additional_fields:
+                    update["additional_fields"] = data_type
+        elif isinstance(obj, OneOfType):
+            kinds = [_replace(x) for x in obj.kinds]
+            if any(x is not y for (x, y) in zip(kinds, obj.kinds)):
+                update["kinds"] = kinds
+        elif isinstance(obj, AbstractList):
+            data_type = _replace(obj.item_type)
+            if data_type is not obj.item_type:
+                update["item_type"] = data_type
+        elif isinstance(obj, Dictionary):
+            data_type = _replace(obj.value_type)
+            if data_type is not obj.value_type:
+                update["value_type"] = data_type
+        if update:
+            replaced[id(obj)] = obj.model_copy(update=update)
+        filtered_results.append(_replace(obj))
+    return (_replace(root), filtered_results)
+
+
 class RequestParameter(BaseModel):
     """OpenAPI Request parameter DataType wrapper"""
 
@@ -649,15 +1134,15 @@ class OpenAPISchemaParser(JsonSchemaParser):
             # if "enum" in param_schema:
             #     dt = Enum(literals=param_schema["enum"], base_types=[ConstraintString])
             # else:
-            dt = ConstraintString(**param_schema)
+            dt = get_primitive_type(ConstraintString, **param_schema)
         elif param_typ == "number":
-            dt = ConstraintNumber(**param_schema)
+            dt = get_primitive_type(ConstraintNumber, **param_schema)
         elif param_typ == "integer":
-            dt = ConstraintInteger(**param_schema)
+            dt = get_primitive_type(ConstraintInteger, **param_schema)
         elif param_typ == "boolean":
-            dt = PrimitiveBoolean(**param_schema)
+            dt = get_primitive_type(PrimitiveBoolean, **param_schema)
         elif param_typ == "null":
-            dt = PrimitiveNull(**param_schema)
+            dt = get_primitive_type(PrimitiveNull, **param_schema)
         elif param_typ == "array":
             try:
                 items_type = param_schema.get("items").get("type")
@@ -668,9 +1153,11 @@ class OpenAPISchemaParser(JsonSchemaParser):
             explode = schema.get("explode", True)
             if items_type == "string":
                 if style == "form" and not explode:
-                    dt = CommaSeparatedList(item_type=ConstraintString())
+                    dt = CommaSeparatedList(
+                        item_type=get_primitive_type(ConstraintString)
+                    )
                 elif style == "form" and explode:
-                    dt = Set(item_type=ConstraintString())
+                    dt = Set(item_type=get_primitive_type(ConstraintString))
                 else:
                     raise NotImplementedError(
                         "Parameter serialization %s not supported" % schema
@@ -679,19 +1166,19 @@ class OpenAPISchemaParser(JsonSchemaParser):
         elif isinstance(param_typ, list):
             # Param type can be anything. Process supported combinations first
             if param_location == "query" and param_name == "limit":
-                dt = ConstraintInteger(minimum=0)
+                dt = get_primitive_type(ConstraintInteger, minimum=0)
             elif param_location == "query" and sorted(
                 ["string", "boolean"]
             ) == sorted(param_typ):
-                dt = PrimitiveBoolean()
+                dt = get_primitive_type(PrimitiveBoolean)
             elif param_location == "query" and sorted(
                 ["string", "integer"]
             ) == sorted(param_typ):
-                dt = ConstraintInteger(**param_schema)
+                dt = get_primitive_type(ConstraintInteger, **param_schema)
             elif param_location == "query" and sorted(
                 ["string", "number"]
             ) == sorted(param_typ):
-                dt = ConstraintNumber(**param_schema)
+                dt = get_primitive_type(ConstraintNumber, **param_schema)
 
         if isinstance(dt, ADT):
             # Set reference into the data_type so that it doesn't mess with main body types
@@ -17,10 +17,13 @@ from codegenerator.base import BaseGenerator
 
 
 class OpenApiSchemaGenerator(BaseGenerator):
+    supports_output_sink = False
+
     def __init__(self):
         super().__init__()
 
-    def get_parser(self, parser):
+    @classmethod
+    def get_parser(cls, parser):
         parser.add_argument(
             "--api-ref-src",
             help="Path to the rendered api-ref html to extract descriptions",
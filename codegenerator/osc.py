@@ -33,10 +33,7 @@ class OSCGenerator(BaseGenerator):
         """Render command code"""
         self._render(impl_template, context, impl_dest.parent, impl_dest.name)
 
-        unittest_path = test_dest.parent
-
-        unittest_path.mkdir(parents=True, exist_ok=True)
-        Path(unittest_path, "__init__.py").touch()
+        self._touch(Path(test_dest.parent, "__init__.py"))
 
         self._render(test_template, context, test_dest.parent, test_dest.name)
 
@@ -61,12 +58,10 @@ class OSCGenerator(BaseGenerator):
         )
 
         work_dir = Path(target_dir)
-        work_dir.mkdir(parents=True, exist_ok=True)
 
         # Generate common (i.e. formatters)
         impl_path = Path(work_dir, "openstackclient", "/".join(osc_path))
-        impl_path.mkdir(parents=True, exist_ok=True)
-        Path(impl_path, "__init__.py").touch()
+        self._touch(Path(impl_path, "__init__.py"))
         self._render(
             "osc/impl_common.py.j2",
             context,
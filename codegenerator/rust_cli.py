@@ -12,13 +12,12 @@
 #
 import logging
 from pathlib import Path
-import subprocess
-import re
 from typing import Type
 
 from codegenerator.base import BaseGenerator
 from codegenerator import common
 from codegenerator import model
+from codegenerator.common import naming
 from codegenerator.common import rust as common_rust
 from codegenerator.common import BasePrimitiveType
 from codegenerator.common import BaseCombinedType
@@ -448,25 +447,14 @@ class RequestTypeManager(common_rust.TypeManager):
 
     def get_local_attribute_name(self, name: str) -> str:
         """Get localized attribute name"""
-        name = name.replace(".", "_")
-        attr_name = "_".join(
-            x.lower() for x in re.split(common.SPLIT_NAME_RE, name)
-        )
-        if attr_name in ["type", "self", "enum", "ref", "default"]:
-            attr_name = f"_{attr_name}"
-        return attr_name
+        return naming.local_name(name)
 
     def get_remote_attribute_name(self, name: str) -> str:
         """Get the attribute name on the SDK side"""
         return self.get_local_attribute_name(name)
 
     def get_var_name_for(self, obj) -> str:
-        attr_name = "_".join(
-            x.lower() for x in re.split(common.SPLIT_NAME_RE, obj.name)
-        )
-        if attr_name in ["type", "self", "enum", "ref"]:
-            attr_name = f"_{attr_name}"
-        return attr_name
+        return naming.local_name(obj.name)
 
     def _get_one_of_type(
         self, type_model: model.OneOfType
@@ -559,7 +547,7 @@ class RequestTypeManager(common_rust.TypeManager):
                     logging.debug(
                         "API accepts only 1 field of type Null. No input is required."
                     )
-                    type_model.fields = {}
+                    type_model = type_model.model_copy(update={"fields": {}})
         if isinstance(type_model, model.Array):
             if isinstance(type_model.item_type, model.Reference):
                 item_type = self._get_adt_by_reference(type_model.item_type)
@@ -602,7 +590,7 @@ class RequestTypeManager(common_rust.TypeManager):
 
         if typ:
             if model_ref:
-                self.refs[model_ref] = typ
+                self._set_ref(model_ref, typ)
         else:
             # Not hacked anything, invoke superior method
             typ = super().convert_model(type_model)
@@ -767,10 +755,7 @@ class ResponseTypeManager(common_rust.TypeManager):
         """
         if not model_ref:
             return "Response"
-        return "Response" + "".join(
-            x.capitalize()
-            for x in re.split(common.SPLIT_NAME_RE, model_ref.name)
-        )
+        return "Response" + self.lowered.get_name(model_ref.name)
 
     def convert_model(
         self,
@@ -811,7 +796,7 @@ class ResponseTypeManager(common_rust.TypeManager):
                 self.ignored_models.append(item_type)
         if typ:
             if model_ref:
-                self.refs[model_ref] = typ
+                self._set_ref(model_ref, typ)
         else:
             # Not hacked anything, invoke superior method
             typ = super().convert_model(type_model)
@@ -837,28 +822,20 @@ class ResponseTypeManager(common_rust.TypeManager):
 
     def _simplify_oneof_combinations(self, type_model, kinds):
         """Simplify certain known oneOf combinations"""
-        kinds_classes = [x["class"] for x in kinds]
-        if (
-            common_rust.String in kinds_classes
-            and common_rust.Number in kinds_classes
-        ):
+        combination = self._get_oneof_combination(type_model, kinds)
+        klass = None
+        if combination and combination.kinds == {"string", "number"}:
             # oneOf [string, number] => NumString
+            klass = NumString
+        elif combination and combination.kinds == {"string", "integer"}:
+            # oneOf [string, integer] => IntString
+            klass = IntString
+        elif combination and combination.kinds == {"string", "boolean"}:
+            # oneOf [string, boolean] => BoolString
+            klass = BoolString
+        if klass:
             kinds.clear()
-            kinds.append({"local": NumString(), "class": NumString})
-        elif (
-            common_rust.String in kinds_classes
-            and common_rust.Integer in kinds_classes
-        ):
-            # oneOf [string, integer] => NumString
-            kinds.clear()
-            kinds.append({"local": IntString(), "class": IntString})
-        elif (
-            common_rust.String in kinds_classes
-            and common_rust.Boolean in kinds_classes
-        ):
-            # oneOf [string, boolean] => String
-            kinds.clear()
-            kinds.append({"local": BoolString(), "class": BoolString})
+            kinds.append({"local": klass(), "class": klass})
         super()._simplify_oneof_combinations(type_model, kinds)
 
     def _get_struct_type(self, type_model: model.Struct) -> common_rust.Struct:
@@ -907,8 +884,8 @@ class ResponseTypeManager(common_rust.TypeManager):
                 mod.additional_fields_type = self.convert_model(definition)
         return mod
 
-    def get_subtypes(self):
-        """Get all subtypes excluding TLA"""
+    def _get_subtypes(self):
+        """Iterate over all subtypes excluding TLA"""
         emited_data: set[str] = set()
         for k, v in self.refs.items():
             if (
@@ -946,10 +923,11 @@ class RustCliGenerator(BaseGenerator):
 
         :param *args: Path to the code to format
         """
-        for path in args:
-            subprocess.run(["rustfmt", "--edition", "2021", path])
+        for path in self._get_paths_to_format(args):
+            self._run_formatter(["rustfmt", "--edition", "2021"], path)
 
-    def get_parser(self, parser):
+    @classmethod
+    def get_parser(cls, parser):
         parser.add_argument(
             "--operation-type",
             choices=[
@@ -1066,29 +1044,28 @@ class RustCliGenerator(BaseGenerator):
             content = request_body.get("content", {})
             body_types = list(content.keys())
 
+        # Parameters are same for all variants. Convert them only once
+        parameters_type_manager = RequestTypeManager()
+        if operation_params:
+            parameters_type_manager.set_parameters(operation_params)
+
         for operation_variant in operation_variants:
-            logging.debug("Processing variant %s" % operation_variant)
+            logging.debug("Processing variant %s", operation_variant)
             additional_imports = set()
-            type_manager: common_rust.TypeManager = RequestTypeManager()
+            type_manager: common_rust.TypeManager = (
+                parameters_type_manager.fork()
+            )
             response_type_manager: common_rust.TypeManager = (
                 ResponseTypeManager()
             )
             result_is_list: bool = False
             is_list_paginated: bool = False
-            if operation_params:
-                type_manager.set_parameters(operation_params)
 
-            mod_name = "_".join(
-                x.lower()
-                for x in re.split(
-                    common.SPLIT_NAME_RE,
-                    (
-                        args.module_name
-                        or args.operation_name
-                        or args.operation_type
-                        or method
-                    ),
-                )
+            mod_name = naming.module_name(
+                args.module_name
+                or args.operation_name
+                or args.operation_type
+                or method
             )
 
             operation_body = operation_variant.get("body")
@@ -1170,10 +1147,16 @@ class RustCliGenerator(BaseGenerator):
                             isinstance(response_def.get("type"), list)
                             and "object" in response_def["type"]
                         ):
-                            (_, response_types) = openapi_parser.parse(
-                                response_def
+                            (
+                                response_root,
+                                response_types,
+                            ) = openapi_parser.parse(response_def)
+                            response_lowered = model.LoweredModels(
+                                response_types
+                            )
+                            response_type_manager.set_models(
+                                response_types, response_lowered
                             )
-                            response_type_manager.set_models(response_types)
 
                             if method == "patch" and not request_types:
                                 # image patch is a jsonpatch based operation
@@ -1189,10 +1172,15 @@ class RustCliGenerator(BaseGenerator):
                                         "serde_json::json",
                                     ]
                                 )
-                                (_, response_types) = openapi_parser.parse(
-                                    response_def, ignore_read_only=True
+                                # Writable view of the already parsed
+                                # response instead of parsing it again
+                                (_, writable_types) = model.filter_read_only(
+                                    response_root, response_types
+                                )
+                                # Unchanged types share the lowering
+                                type_manager.set_models(
+                                    writable_types, response_lowered
                                 )
-                                type_manager.set_models(response_types)
 
                         elif response_def["type"] == "string":
                             (root_dt, _) = openapi_parser.parse(response_def)
@@ -1213,6 +1201,7 @@ class RustCliGenerator(BaseGenerator):
                             response_type_manager.refs[
                                 model.Reference(name="Body", type=TupleStruct)
                             ] = tuple_struct
+                            response_type_manager.invalidate_views()
                         elif (
                             response_def["type"] == "array"
                             and "items" in response_def
@@ -10,16 +10,18 @@
 #   License for the specific language governing permissions and limitations
 #   under the License.
 #
+import hashlib
 import logging
 from pathlib import Path
-import re
-import subprocess
 from typing import Type, Any
 
+from pydantic import BaseModel
+
 from codegenerator.base import BaseGenerator
 from codegenerator import common
 from codegenerator import model
 from codegenerator.common import BaseCompoundType
+from codegenerator.common import naming
 from codegenerator.common import rust as common_rust
 
 
@@ -205,7 +207,7 @@ class RequestParameter(common_rust.RequestParameter):
 
     @property
     def builder_macros(self):
-        macros = self.data_type.builder_macros
+        macros = set(self.data_type.builder_macros)
         macros.add("default")
         if self.setter_name:
             macros.add(f'setter(name="_{self.setter_name}")')
@@ -253,20 +255,155 @@ class TypeManager(common_rust.TypeManager):
                 param.setter_type = "list"
             self.parameters[k] = param
 
+    def get_type_dependencies(self, data_type) -> set[str]:
+        """Get names of the compound types the type refers to
+
+        Nested container types are followed while referred compound types
+        are not descended into.
+        """
+        result: set[str] = set()
+        stack: list[Any] = list(data_type.__dict__.values())
+        while stack:
+            item = stack.pop()
+            if isinstance(item, BaseCompoundType):
+                result.add(item.name)
+            elif isinstance(item, BaseModel):
+                stack.extend(item.__dict__.values())
+            elif isinstance(item, dict):
+                stack.extend(item.values())
+            elif isinstance(item, (list, tuple, set)):
+                stack.extend(item)
+        return result
+
+
+#: Placeholders in the operation module rendered with the shared types
+#: enabled. They are replaced once the shared types are known.
+SHARED_TYPES_SLOT = "@@shared_types@@"
+SUBTYPES_SLOT = "@@subtypes@@"
+
+
+class SharedTypes:
+    """Registry of the Rust SDK types shared between operations
+
+    Types with identical Rust representation used by at least two
+    operations of the service are emitted only once into the `types` module
+    of the service (i.e. `crate::api::compute::v2::types`) and are imported
+    by the operation modules. Types are identified by the structural hash of
+    their schema (`model.Reference.hash_`) and the digest of the rendered
+    code.
+
+    Whether a type is shared can only be decided once all operations of the
+    service are known. Operations are therefore rendered with placeholders
+    for the imports of the shared types and for the local subtypes, and the
+    shared types are selected afterwards, independently of the order of the
+    operations.
+    """
+
+    def __init__(self):
+        #: Operations ({path, impl_path, content, types}) per service module
+        self.operations: dict[tuple[str, ...], list[dict[str, Any]]] = {}
+        #: Names of the resource modules per service module
+        self.modules: dict[tuple[str, ...], set[str]] = {}
+
+    def add_operation(
+        self,
+        mod_path: list[str],
+        path: str,
+        impl_path: Path,
+        content: str,
+        types: dict[str, dict[str, Any]],
+    ) -> None:
+        """Register operation with its subtypes
+
+        :param mod_path: Module path of the operation (`[service, version,
+            resource, ...]`).
+        :param content: Operation module rendered with the placeholders.
+        :param types: Subtypes of the operation (`{name: {key, content,
+            imports, dependencies, builder}}`) in the order of rendering.
+        """
+        key = tuple(mod_path[0:2])
+        if len(mod_path) > 2:
+            self.modules.setdefault(key, set()).add(mod_path[2])
+        operations = self.operations.setdefault(key, [])
+        # Module generated again replaces the previous one
+        operations[:] = [x for x in operations if x["impl_path"] != impl_path]
+        operations.append(
+            dict(path=path, impl_path=impl_path, content=content, types=types)
+        )
+
+    def get_mod_name(self, mod_path: list[str]) -> str:
+        """Get name of the shared types module of the service
+
+        `types` is used unless there is a resource module with such name.
+        """
+        modules = self.modules.get(tuple(mod_path), set())
+        name = "types"
+        if name in modules:
+            name = "shared_types"
+            idx = 1
+            while name in modules:
+                name = f"shared_types_{idx}"
+                idx += 1
+        return name
+
+    def get_types(self, mod_path: list[str]) -> dict[str, dict[str, Any]]:
+        """Get types shared by operations of the module
+
+        A type is shared when it is used by at least two operations, no
+        other variant of the type with the same name is used by two
+        operations as well and all types it refers to are shared too.
+        """
+        operations = self.operations.get(tuple(mod_path), [])
+        usage: dict[str, dict[Any, int]] = {}
+        for operation in operations:
+            for name, data in operation["types"].items():
+                keys = usage.setdefault(name, {})
+                keys[data["key"]] = keys.get(data["key"], 0) + 1
+        shared: dict[str, Any] = {}
+        for name, keys in usage.items():
+            candidates = [key for key, count in keys.items() if count > 1]
+            if len(candidates) == 1:
+                shared[name] = candidates[0]
+
+        def is_shared(name: str, data: dict[str, Any]) -> bool:
+            return name in shared and shared[name] == data["key"]
+
+        changed = True
+        while changed:
+            changed = False
+            for operation in operations:
+                types = operation["types"]
+                for name, data in types.items():
+                    if is_shared(name, data) and not all(
+                        is_shared(dependency, types[dependency])
+                        for dependency in data["dependencies"]
+                    ):
+                        shared.pop(name)
+                        changed = True
+        result: dict[str, dict[str, Any]] = {}
+        for operation in operations:
+            for name, data in operation["types"].items():
+                if is_shared(name, data):
+                    result.setdefault(name, data)
+        return dict(sorted(result.items()))
+
 
 class RustSdkGenerator(BaseGenerator):
     def __init__(self):
         super().__init__()
+        #: Registry of types shared between operations (disabled when None)
+        self.shared_types: SharedTypes | None = None
 
     def _format_code(self, *args):
         """Format code using Rustfmt
 
         :param *args: Path to the code to format
         """
-        for path in args:
-            subprocess.run(["rustfmt", "--edition", "2021", path])
+        for path in self._get_paths_to_format(args):
+            self._run_formatter(["rustfmt", "--edition", "2021"], path)
 
-    def get_parser(self, parser):
+    @classmethod
+    def get_parser(cls, parser):
         parser.add_argument(
             "--response-key",
             help="Rust SDK response key (only required when normal detection does not work)",
@@ -276,9 +413,116 @@ class RustSdkGenerator(BaseGenerator):
             "--response-list-item-key",
             help='Rust SDK list response item key (specifies whether list items are wrapped in additional container `{"keypairs":["keypair":{}]}`)',
         )
+        parser.add_argument(
+            "--shared-types",
+            action="store_true",
+            help="Emit types identical across operations of the service once into the shared `types` module (requires processing of the whole service with `--metadata`)",
+        )
 
         return parser
 
+    def _get_subtypes_data(
+        self, type_manager: TypeManager
+    ) -> dict[str, dict[str, Any]]:
+        """Get rendered subtypes of the operation with their identity
+
+        :returns: Dictionary `{name: {key, content, imports, dependencies,
+            builder}}` where dependencies are names of the other subtypes of
+            the operation the subtype refers to and builder tells whether
+            the subtype comes with the builder.
+        """
+        template = self.env.get_template("rust_sdk/subtypes.j2")
+        hashes = {id(v): k.hash_ for (k, v) in type_manager.refs.items() if k}
+        subtypes = list(type_manager.get_subtypes())
+        names = set(x.name for x in subtypes)
+        result: dict[str, dict[str, Any]] = {}
+        for subtype in subtypes:
+            content = template.render(
+                type_manager=type_manager, subtypes=[subtype]
+            )
+            result[subtype.name] = dict(
+                key=(
+                    hashes.get(id(subtype)),
+                    hashlib.md5(content.encode()).hexdigest(),
+                ),
+                content=content,
+                imports=subtype.imports,
+                dependencies=(
+                    type_manager.get_type_dependencies(subtype) & names
+                ),
+                builder="Builder" in (subtype.derive_container_macros or ""),
+            )
+        return result
+
+    def generate_types_mods(
+        self, target_dir
+    ) -> list[tuple[list[str], str, str]]:
+        """Generate operation modules and modules with the shared types
+
+        With the shared types enabled writing of the operation modules is
+        postponed until all operations are known. This must be called once
+        all operations of the services were processed.
+
+        :returns: List of `(mod_path, mod_name, path)` of the generated
+            shared types modules.
+        """
+        if self.shared_types is None:
+            return []
+        results: list[tuple[list[str], str, str]] = []
+        use_template = self.env.get_template("rust_sdk/shared_types_use.j2")
+        for mod_path, operations in self.shared_types.operations.items():
+            types = self.shared_types.get_types(list(mod_path))
+            types_mod = self.shared_types.get_mod_name(list(mod_path))
+            for operation in operations:
+                shared_types: list[str] = []
+                subtypes: list[str] = []
+                for name, data in operation["types"].items():
+                    if name in types and types[name]["key"] == data["key"]:
+                        shared_types.append(name)
+                        if data["builder"]:
+                            shared_types.append(f"{name}Builder")
+                    else:
+                        subtypes.append(data["content"])
+                content = (
+                    operation["content"]
+                    .replace(
+                        SHARED_TYPES_SLOT,
+                        use_template.render(
+                            shared_types=shared_types,
+                            shared_types_mod="::".join([*mod_path, types_mod]),
+                        ),
+                    )
+                    .replace(SUBTYPES_SLOT, "".join(subtypes))
+                )
+                self._write(operation["impl_path"], [content])
+                self._format_code(operation["impl_path"])
+            if not types:
+                continue
+            imports: set[str] = set()
+            for data in types.values():
+                imports.update(data["imports"])
+            impl_path = Path(
+                target_dir,
+                "rust",
+                "openstack_sdk",
+                "src",
+                "api",
+                "/".join(mod_path),
+                f"{types_mod}.rs",
+            )
+            self._render_command(
+                dict(
+                    service_name=mod_path[0],
+                    imports=imports,
+                    types=[x["content"] for x in types.values()],
+                ),
+                "rust_sdk/types.rs.j2",
+                impl_path,
+            )
+            self._format_code(impl_path)
+            results.append((list(mod_path), types_mod, operations[0]["path"]))
+        return results
+
     def _render_command(
         self,
         context: dict,
@@ -350,9 +594,12 @@ class RustSdkGenerator(BaseGenerator):
         operation_variants = common.get_operation_variants(
             spec, args.operation_name
         )
+        # Parameters are same for all variants. Convert them only once
+        parameters_type_manager = TypeManager()
+        parameters_type_manager.set_parameters(operation_params)
 
         for operation_variant in operation_variants:
-            logging.debug("Processing variant %s" % operation_variant)
+            logging.debug("Processing variant %s", operation_variant)
             # TODO(gtema): if we are in MV variants filter out unsupported query
             # parameters
             # TODO(gtema): previously we were ensuring `router_id` path param
@@ -360,19 +607,12 @@ class RustSdkGenerator(BaseGenerator):
 
             class_name = res_name.title()
             operation_body = operation_variant.get("body")
-            type_manager = TypeManager()
-            type_manager.set_parameters(operation_params)
-            mod_name = "_".join(
-                x.lower()
-                for x in re.split(
-                    common.SPLIT_NAME_RE,
-                    (
-                        args.module_name
-                        or args.operation_name
-                        or args.operation_type.value
-                        or method
-                    ),
-                )
+            type_manager = parameters_type_manager.fork()
+            mod_name = naming.module_name(
+                args.module_name
+                or args.operation_name
+                or args.operation_type.value
+                or method
             )
 
             if operation_body:
@@ -456,7 +696,6 @@ class RustSdkGenerator(BaseGenerator):
                 mime_type=mime_type,
                 is_json_patch=is_json_patch,
             )
-
             work_dir = Path(target_dir, "rust", "openstack_sdk", "src")
             impl_path = Path(
                 work_dir,
@@ -465,6 +704,24 @@ class RustSdkGenerator(BaseGenerator):
                 f"{mod_name}.rs",
             )
 
+            if self.shared_types is not None:
+                # Module is written once all operations are known
+                context.update(
+                    shared_types_slot=SHARED_TYPES_SLOT,
+                    subtypes_slot=SUBTYPES_SLOT,
+                )
+                self.shared_types.add_operation(
+                    mod_path,
+                    path,
+                    impl_path,
+                    self.env.get_template("rust_sdk/impl.rs.j2").render(
+                        **context
+                    ),
+                    self._get_subtypes_data(type_manager),
+                )
+                yield (mod_path, mod_name, path)
+                continue
+
             # Generate methods for the GET resource command
             self._render_command(
                 context,
@@ -496,12 +753,14 @@ class RustSdkGenerator(BaseGenerator):
             service_name=service_name,
         )
 
-        # Generate methods for the GET resource command
-        self._render_command(
-            context,
-            "rust_sdk/mod.rs.j2",
-            impl_path,
-        )
+        # Module is generated again for every new submodule. Only the last
+        # version ends up in the output
+        with self.output_sink.deferred():
+            self._render_command(
+                context,
+                "rust_sdk/mod.rs.j2",
+                impl_path,
+            )
 
         self._format_code(impl_path)
 
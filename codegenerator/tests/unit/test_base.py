@@ -0,0 +1,547 @@
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+import io
+from pathlib import Path
+import struct
+import tarfile
+import tempfile
+from unittest import TestCase
+from unittest import mock
+import zipfile
+
+from jinja2 import DictLoader
+from jinja2.runtime import Macro
+
+from codegenerator import base
+from codegenerator import hooks
+from codegenerator import model
+from codegenerator import rust_cli
+from codegenerator import rust_sdk
+from codegenerator.common import rust as common_rust
+from codegenerator.tests.unit import test_model
+
+
+class TestTemplates(TestCase):
+    def test_compile_templates(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            base.compile_templates(Path(tmpdir))
+            self.assertEqual(
+                base.get_templates_checksum(),
+                Path(tmpdir, base.COMPILED_TEMPLATES_CHECKSUM).read_text(),
+            )
+            with mock.patch.object(
+                base, "COMPILED_TEMPLATES_DIR", Path(tmpdir)
+            ):
+                loader = base._get_templates_loader()
+                Path(tmpdir, base.COMPILED_TEMPLATES_CHECKSUM).write_text("")
+                outdated_loader = base._get_templates_loader()
+        self.assertIsInstance(loader, base.ChoiceLoader)
+        self.assertIsInstance(outdated_loader, base.FileSystemLoader)
+
+    def test_compile_templates_build(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            hooks.compile_templates(Path(tmpdir))
+            target = Path(tmpdir, "codegenerator", "templates_compiled")
+            self.assertEqual(
+                base.get_templates_checksum(),
+                Path(target, base.COMPILED_TEMPLATES_CHECKSUM).read_text(),
+            )
+            self.assertTrue(list(target.glob("*.py")))
+
+    def test_get_environment(self):
+        env = base.get_environment()
+        self.assertIs(env, base.get_environment())
+        self.assertIn("wrap_markdown", env.filters)
+        env.get_template("rust_macros.j2")
+
+
+class Generator(base.BaseGenerator):
+    def generate(
+        self, res, target_dir, openapi_spec=None, operation_id=None, args=None
+    ):
+        pass
+
+
+class TestWriteIfChanged(TestCase):
+    def _format(self, returncode):
+        def run(command):
+            Path(command[-1]).write_text("formatted")
+            return mock.Mock(returncode=returncode)
+
+        return mock.patch.object(base.subprocess, "run", side_effect=run)
+
+    def test_render(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            hashes_path = Path(tmpdir, "hashes.json")
+            path = Path(tmpdir, "out", "mod.rs")
+            context: dict = dict(
+                mod_list=["foo"], mod_path=["compute", "v2"], service_name="x"
+            )
+            generator = Generator()
+            generator.output_hashes = base.OutputHashes(hashes_path)
+            generator._render(
+                "rust_sdk/mod.rs.j2", context, path.parent, path.name
+            )
+            self.assertEqual([path], generator._get_paths_to_format([path]))
+            with self._format(0):
+                generator._format_code(path)
+            generator.output_hashes.save()
+
+            generator = Generator()
+            generator.output_hashes = base.OutputHashes(hashes_path)
+            generator._render(
+                "rust_sdk/mod.rs.j2", context, path.parent, path.name
+            )
+            self.assertEqual("formatted", path.read_text())
+            self.assertEqual([], generator._get_paths_to_format([path]))
+            context["mod_list"].append("bar")
+            generator._render(
+                "rust_sdk/mod.rs.j2", context, path.parent, path.name
+            )
+            self.assertNotEqual("formatted", path.read_text())
+            self.assertEqual([path], generator._get_paths_to_format([path]))
+            self.assertEqual(1, generator.output_hashes.changed)
+            self.assertEqual(1, generator.output_hashes.unchanged)
+            self.assertEqual([path], list(path.parent.iterdir()))
+
+    def test_render_changed_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            hashes_path = Path(tmpdir, "hashes.json")
+            path = Path(tmpdir, "out", "mod.rs")
+            context: dict = dict(
+                mod_list=["foo"], mod_path=["compute", "v2"], service_name="x"
+            )
+            generator = Generator()
+            generator.output_hashes = base.OutputHashes(hashes_path)
+            generator._render(
+                "rust_sdk/mod.rs.j2", context, path.parent, path.name
+            )
+            generator.output_hashes.save()
+            # File edited outside of the generator is written again
+            path.write_text("edited")
+            generator.output_hashes = base.OutputHashes(hashes_path)
+            generator._render(
+                "rust_sdk/mod.rs.j2", context, path.parent, path.name
+            )
+            self.assertNotEqual("edited", path.read_text())
+            # Hashes of the file failed to be formatted are dropped
+            with self._format(1):
+                generator._format_code(path)
+            generator.output_hashes.save()
+            generator.output_hashes = base.OutputHashes(hashes_path)
+            generator._render(
+                "rust_sdk/mod.rs.j2", context, path.parent, path.name
+            )
+            self.assertEqual(1, generator.output_hashes.changed)
+            # Hashes of the interrupted run are not recorded
+            output_hashes = base.OutputHashes(hashes_path)
+            self.assertTrue(output_hashes.check(path, "other"))
+            output_hashes.save()
+            self.assertEqual({}, base.OutputHashes(hashes_path).hashes)
+
+    def test_render_failure(self):
+        def fail():
+            raise ValueError("failed")
+
+        for with_hashes in [True, False]:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                path = Path(tmpdir, "mod.rs")
+                path.write_text("previous")
+                generator = Generator()
+                generator.env = base._create_environment(
+                    DictLoader({"mod.j2": "{{ 'x' * 10000 }}{{ fail() }}"})
+                )
+                if with_hashes:
+                    generator.output_hashes = base.OutputHashes(
+                        Path(tmpdir, "out", "h")
+                    )
+                with self.assertRaises(ValueError):
+                    generator._render(
+                        "mod.j2", dict(fail=fail), path.parent, "mod.rs"
+                    )
+                self.assertEqual("previous", path.read_text())
+                self.assertEqual([path], list(Path(tmpdir).iterdir()))
+
+
+class TestOutputTree(TestCase):
+    def test_flush(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tree = base.OutputTree()
+            tree.write(Path(tmpdir, "a", "b.rs"), "b")
+            tree.write(Path(tmpdir, "c.rs"), "old")
+            tree.write(Path(tmpdir, "c.rs"), "c")
+            self.assertEqual([], list(Path(tmpdir).iterdir()))
+            tree.flush(workers=2)
+            self.assertEqual("b", Path(tmpdir, "a", "b.rs").read_text())
+            self.assertEqual("c", Path(tmpdir, "c.rs").read_text())
+            self.assertEqual({}, tree.files)
+
+    def test_flush_failure(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            Path(tmpdir, "c.rs").write_text("c")
+            tree = base.OutputTree()
+            tree.write(Path(tmpdir, "c.rs"), "new")
+            # Not encodable content
+            tree.write(Path(tmpdir, "d.rs"), "\udcff")
+            with self.assertRaises(UnicodeEncodeError):
+                tree.flush()
+            self.assertEqual(
+                ["c.rs"], [x.name for x in Path(tmpdir).iterdir()]
+            )
+            self.assertEqual("c", Path(tmpdir, "c.rs").read_text())
+
+    def test_generator_flush_output(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir, "mod.rs")
+            generator = Generator()
+            generator.output_tree = base.OutputTree()
+            with mock.patch.object(base.subprocess, "run") as run:
+                generator._render(
+                    "rust_sdk/mod.rs.j2",
+                    dict(mod_list=[], mod_path=[], service_name="x"),
+                    path.parent,
+                    path.name,
+                )
+                generator._format_code(path)
+                self.assertFalse(path.exists())
+                run.assert_not_called()
+                generator.flush_output()
+                self.assertTrue(path.exists())
+                run.assert_called_once_with(["black", "-l", "79", path])
+
+
+class TestTemplateProfiler(TestCase):
+    def test_profile(self):
+        env = base._create_environment(
+            DictLoader(
+                {
+                    "macros.j2": "{% macro item(x) %}<{{ x }}>{% endmacro %}",
+                    "list.j2": (
+                        "{% import 'macros.j2' as macros %}"
+                        "{% for x in items %}{{ macros.item(x) }}{% endfor %}"
+                    ),
+                    "main.j2": "[{% include 'list.j2' %}]",
+                }
+            )
+        )
+        macro_invoke = Macro._invoke
+        profiler = base.TemplateProfiler()
+        profiler.install(env)
+        try:
+            content = env.get_template("main.j2").render(items=[1, 2, 3])
+            env.get_template("main.j2").render(items=[4])
+        finally:
+            profiler.uninstall()
+        self.assertEqual("[<1><2><3>]", content)
+        self.assertIs(macro_invoke, Macro._invoke)
+        self.assertNotIn("get_template", vars(env))
+        calls = {key: stats[0] for key, stats in profiler.stats.items()}
+        self.assertEqual(
+            {
+                ("template", "main.j2"): 2,
+                ("template", "list.j2"): 2,
+                # Imported without context only once
+                ("template", "macros.j2"): 1,
+                ("macro", "macros.j2:item"): 4,
+            },
+            calls,
+        )
+        (_, total, own) = profiler.stats[("template", "main.j2")]
+        (_, list_total, _) = profiler.stats[("template", "list.j2")]
+        self.assertGreaterEqual(total, list_total)
+        self.assertAlmostEqual(own, total - list_total, delta=0.01)
+        report = profiler.report(limit=2).splitlines()
+        self.assertEqual(3, len(report))
+        self.assertIn("calls", report[0])
+
+        # Stats are not recorded anymore
+        env.get_template("main.j2").render(items=[1])
+        self.assertEqual(2, profiler.stats[("template", "main.j2")][0])
+
+
+class TestFragmentCache(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.env = base._create_environment(
+            DictLoader(
+                {
+                    "types.j2": (
+                        "{% for x in types %}{% cache x, manager %}"
+                        "{{ render(x) }};{% endcache %}{% endfor %}"
+                    )
+                }
+            )
+        )
+        base.enable_fragment_cache(self.env)
+        self.rendered: list = []
+
+        def render(x):
+            self.rendered.append(x)
+            return x.name if isinstance(x, model.Reference) else len(x)
+
+        self.env.globals["render"] = render
+        self.template = self.env.get_template("types.j2")
+
+    def test_render(self):
+        types = [
+            model.Reference(name="foo", type=model.Struct),
+            model.Reference(name="bar", type=model.Struct),
+            model.Reference(name="foo", type=model.Struct),
+        ]
+        self.assertEqual(
+            "foo;bar;foo;",
+            self.template.render(types=types, manager=rust_sdk.TypeManager()),
+        )
+        self.assertEqual(types[0:2], self.rendered)
+        # Different target flags are rendered separately
+        self.template.render(
+            types=types[0:1], manager=rust_cli.ResponseTypeManager()
+        )
+        self.template.render(types=types[0:1], manager="")
+        self.assertEqual(4, len(self.rendered))
+
+        self.env.fragment_cache = None
+        self.template.render(types=types, manager=rust_sdk.TypeManager())
+        self.assertEqual(7, len(self.rendered))
+
+    def test_render_containers(self):
+        types = [["a", 1], ["a", True], {"a": 1}, {"a": 2}, ["a", 1]]
+        self.assertEqual(
+            "2;2;1;1;2;", self.template.render(types=types, manager=None)
+        )
+        self.assertEqual(types[0:4], self.rendered)
+        with self.assertRaises(TypeError):
+            self.template.render(types=[object()], manager=None)
+
+    def test_disabled(self):
+        env = base._create_environment(DictLoader({}))
+        self.assertIsNone(env.fragment_cache)
+        base.enable_fragment_cache(env)
+        self.assertEqual({}, env.fragment_cache)
+
+    def test_model_digest(self):
+        type_manager = rust_sdk.TypeManager()
+        type_manager.set_models(test_model.EXPECTED_DATA_TYPES)
+        subtypes = list(type_manager.get_subtypes())
+        digests = [base.get_model_digest(x) for x in subtypes]
+        with mock.patch.object(
+            common_rust,
+            "get_model_digest",
+            side_effect=base.get_model_digest,
+        ) as get_digest:
+            self.assertEqual(
+                digests,
+                [type_manager.get_model_digest(x) for x in subtypes],
+            )
+            self.assertEqual(
+                digests,
+                [type_manager.get_model_digest(x) for x in subtypes],
+            )
+        # Digest is computed once per model
+        self.assertEqual(len(subtypes), get_digest.call_count)
+        # and invalidated with the models
+        type_manager.invalidate_views()
+        self.assertNotIn("digests", type_manager._views)
+
+        # Models nested in the walked ones are digested only once
+        server = [x for x in subtypes if x.name == "Server"][0]
+        known: dict = {}
+        base.get_model_digest(server, known)
+        self.assertIn(id(server), known)
+        for subtype in subtypes:
+            if subtype.name in ("Networks", "SecurityGroups"):
+                self.assertIn(id(subtype), known)
+        # Changed model gets different digest
+        changed = server.model_copy(update=dict(name="Other"))
+        self.assertNotEqual(
+            base.get_model_digest(server), base.get_model_digest(changed)
+        )
+
+    def test_cache_size(self):
+        types = [model.Reference(name=str(x), type=model.Struct) for x in "ab"]
+        with mock.patch.object(
+            base.FragmentCacheExtension, "FRAGMENT_CACHE_SIZE", 1
+        ):
+            self.template.render(types=types + types[1:], manager=None)
+            self.assertEqual(1, len(self.env.fragment_cache))
+            self.template.render(types=types, manager=None)
+        self.assertEqual(["a", "b", "a", "b"], [x.name for x in self.rendered])
+
+
+class TestMarkdownCache(TestCase):
+    def test_wrap_markdown(self):
+        text = "word " * 30
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir, "markdown.json")
+            cache = base.MarkdownCache(path)
+            base.wrap_markdown.cache_clear()
+            with mock.patch.object(base, "markdown_cache", cache):
+                wrapped = base.wrap_markdown(text, 40)
+                self.assertIs(wrapped, base.wrap_markdown(text, 40))
+            cache.save()
+            self.assertEqual(wrapped, base.md.text(text, options={"wrap": 40}))
+
+            # Persisted result is used in the next run
+            base.wrap_markdown.cache_clear()
+            with mock.patch.object(
+                base, "markdown_cache", base.MarkdownCache(path)
+            ), mock.patch.object(base.md, "text") as md_text:
+                self.assertEqual(wrapped, base.wrap_markdown(text, 40))
+                base.wrap_markdown(text, 50)
+            md_text.assert_called_once_with(text, options={"wrap": 50})
+            base.wrap_markdown.cache_clear()
+
+    def test_save(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir, "markdown.json")
+            cache = base.MarkdownCache(path)
+            cache.set("foo", {"wrap": 40}, "foo")
+            cache.set("bar", {"wrap": 40}, "bar")
+            cache.save()
+
+            # Entries not used during the run are dropped
+            cache = base.MarkdownCache(path)
+            self.assertEqual("foo", cache.get("foo", {"wrap": 40}))
+            self.assertIsNone(cache.get("foo", {"wrap": 50}))
+            cache.save()
+            cache = base.MarkdownCache(path)
+            self.assertIsNone(cache.get("bar", {"wrap": 40}))
+            self.assertEqual("foo", cache.get("foo", {"wrap": 40}))
+
+            # Cache of the other mdformat version is not used
+            with mock.patch.object(base.md, "__version__", "0.0.1"):
+                cache = base.MarkdownCache(path)
+            self.assertIsNone(cache.get("foo", {"wrap": 40}))
+
+
+class TestOutputSink(TestCase):
+    def _render(self, sink, before_close=None):
+        generator = Generator()
+        generator.output_sink = sink
+
+        def render(name, mod):
+            generator._render(
+                "rust_sdk/mod.rs.j2",
+                dict(mod_list=[mod], mod_path=["compute"], service_name="x"),
+                Path("wrk", "src", "api"),
+                name,
+            )
+
+        # Deferred file rendered again replaces the previous content
+        with sink.deferred():
+            render("foo.rs", "a")
+        render("bar.rs", "bar.rs")
+        with sink.deferred():
+            render("foo.rs", "foo.rs")
+        self.assertEqual([], generator._get_paths_to_format(["foo.rs"]))
+        if before_close:
+            before_close()
+        sink.close()
+        return generator.env.get_template("rust_sdk/mod.rs.j2").render(
+            mod_list=["foo.rs"], mod_path=["compute"], service_name="x"
+        )
+
+    def test_directory(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            sink = base.DirectorySink()
+            path = Path(tmpdir, "src", "foo.rs")
+            self.assertTrue(sink.write(path, ["foo", "bar"]))
+            self.assertEqual("foobar", path.read_text())
+
+    def test_archive(self):
+        for archive_format in base.ArchiveSink.ARCHIVE_FORMATS:
+            fileobj = io.BytesIO()
+            content = self._render(
+                base.ArchiveSink(fileobj, Path("wrk"), archive_format)
+            )
+            fileobj.seek(0)
+            if archive_format == "zip":
+                with zipfile.ZipFile(fileobj) as archive:
+                    self.assertEqual(
+                        ["src/api/bar.rs", "src/api/foo.rs"],
+                        archive.namelist(),
+                    )
+                    data = archive.read("src/api/foo.rs")
+            else:
+                with tarfile.open(fileobj=fileobj) as archive:
+                    self.assertEqual(
+                        ["src/api/bar.rs", "src/api/foo.rs"],
+                        archive.getnames(),
+                    )
+                    member = archive.extractfile("src/api/foo.rs")
+                    assert member is not None
+                    data = member.read()
+            self.assertEqual(content, data.decode())
+
+    def test_archive_reproducible(self):
+        for archive_format in base.ArchiveSink.ARCHIVE_FORMATS:
+            archives = []
+            for now in [1000000000, 2000000000]:
+                fileobj = io.BytesIO()
+                with mock.patch("time.time", return_value=now):
+                    self._render(
+                        base.ArchiveSink(fileobj, Path("wrk"), archive_format)
+                    )
+                archives.append(fileobj.getvalue())
+            self.assertEqual(archives[0], archives[1], archive_format)
+
+    def _read_stream(self, stream):
+        stream.seek(0)
+        files = []
+        while header := stream.read(8):
+            name = stream.read(struct.unpack(">Q", header)[0]).decode()
+            (size,) = struct.unpack(">Q", stream.read(8))
+            files.append((name, stream.read(size).decode()))
+        return files
+
+    def test_stream(self):
+        stream = io.BytesIO()
+        written = []
+        content = self._render(
+            base.StreamSink(stream, Path("wrk")),
+            lambda: written.extend(self._read_stream(stream)),
+        )
+        # Files are written as they are rendered, deferred ones on close
+        self.assertEqual(["src/api/bar.rs"], [x[0] for x in written])
+        files = self._read_stream(stream)
+        self.assertEqual(
+            ["src/api/bar.rs", "src/api/foo.rs"], [x[0] for x in files]
+        )
+        self.assertEqual(content, files[1][1])
+
+    def test_stream_rewritten(self):
+        stream = io.BytesIO()
+        sink = base.StreamSink(stream, Path("wrk"))
+        sink.write(Path("wrk", "foo.rs"), ["a"])
+        sink.write(Path("wrk", "foo.rs"), ["b"])
+        sink.close()
+        # Files written again are not deferred, the last one wins
+        self.assertEqual(
+            [("foo.rs", "a"), ("foo.rs", "b")], self._read_stream(stream)
+        )
+
+    def test_touch(self):
+        generator = Generator()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir, "pkg", "__init__.py")
+            generator._touch(path)
+            self.assertEqual("", path.read_text())
+            path.write_text("foo")
+            # Present file is kept
+            generator._touch(path)
+            self.assertEqual("foo", path.read_text())
+        stream = io.BytesIO()
+        generator.output_sink = base.StreamSink(stream, Path("wrk"))
+        generator._touch(Path("wrk", "pkg", "__init__.py"))
+        generator.output_sink.close()
+        self.assertEqual([("pkg/__init__.py", "")], self._read_stream(stream))
@@ -10,9 +10,13 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 #
+import copy
 import logging
+import sys
 from unittest import TestCase
 
+from pydantic import ValidationError
+
 from codegenerator import model
 
 
@@ -1328,3 +1332,187 @@ class TestModel(TestCase):
         parser = model.OpenAPISchemaParser()
         (res, all_models) = parser.parse(schema)
         self.assertEqual(4, len(all_models))
+
+    def test_iterative_parse(self):
+        parser = model.JsonSchemaParser(iterative=False)
+        iterative_parser = model.JsonSchemaParser()
+        (res, all_models) = parser.parse(copy.deepcopy(SAMPLE_SERVER_SCHEMA))
+        (it_res, it_all_models) = iterative_parser.parse(
+            copy.deepcopy(SAMPLE_SERVER_SCHEMA)
+        )
+        self.assertEqual(res, it_res)
+        self.assertEqual(all_models, it_all_models)
+
+    def test_iterative_parse_deep_schema(self):
+        depth = 500
+        schema: dict = {"type": "string"}
+        for i in range(depth):
+            schema = {
+                "type": "object",
+                "properties": {f"level_{i}": schema},
+            }
+        parser = model.JsonSchemaParser()
+        recursion_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(250)
+        try:
+            (res, all_models) = parser.parse(schema)
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+        self.assertIsInstance(res, model.Struct)
+        self.assertEqual(depth, len(all_models))
+        self.assertEqual(res, all_models[-1])
+
+    def test_filter_read_only(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "id": {"type": "string", "readOnly": True},
+                "name": {"type": "string"},
+                "locations": {
+                    "type": "array",
+                    "readOnly": True,
+                    "items": {
+                        "type": "object",
+                        "properties": {"url": {"type": "string"}},
+                    },
+                },
+                "metadata": {
+                    "type": "object",
+                    "properties": {
+                        "size": {"type": "integer", "readOnly": True},
+                        "tags": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                        },
+                    },
+                },
+            },
+        }
+        parser = model.JsonSchemaParser()
+        (res, all_models) = parser.parse(copy.deepcopy(schema))
+        (expected_res, expected_models) = parser.parse(
+            copy.deepcopy(schema), ignore_read_only=True
+        )
+        (filtered_res, filtered_models) = model.filter_read_only(
+            res, all_models
+        )
+        self.assertEqual(expected_res, filtered_res)
+        self.assertEqual(expected_models, filtered_models)
+        # Original parse result is not modified
+        self.assertIsInstance(res, model.Struct)
+        if isinstance(res, model.Struct):
+            self.assertIn("locations", res.fields)
+            self.assertTrue(res.fields["id"].is_read_only)
+        metadata = [
+            x
+            for x in all_models
+            if x.reference and x.reference.name == "metadata"
+        ]
+        self.assertIsInstance(metadata[0], model.Struct)
+        if isinstance(metadata[0], model.Struct):
+            self.assertIn("size", metadata[0].fields)
+
+    def test_primitive_types_shared(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "id": {"type": "string", "format": "uuid"},
+                "project_id": {
+                    "type": "string",
+                    "format": "uuid",
+                    "description": "Project ID",
+                },
+                "name": {"type": "string"},
+                "count": {"type": "integer", "minimum": 1},
+                "ratio": {"type": "number", "minimum": 1.0},
+            },
+        }
+        parser = model.JsonSchemaParser()
+        (res, _) = parser.parse(schema)
+        self.assertIsInstance(res, model.Struct)
+        if not isinstance(res, model.Struct):
+            return
+        fields = res.fields
+        self.assertIs(fields["id"].data_type, fields["project_id"].data_type)
+        self.assertIsNot(fields["id"].data_type, fields["name"].data_type)
+        self.assertIs(
+            fields["name"].data_type,
+            model.get_primitive_type(model.ConstraintString),
+        )
+        self.assertIsNot(fields["count"].data_type, fields["ratio"].data_type)
+        with self.assertRaises(ValidationError):
+            fields["name"].data_type.format = "uuid"
+
+    def test_lowered_models(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "description": {
+                    "oneOf": [
+                        {"type": "string"},
+                        {"type": "null"},
+                        {"type": "string"},
+                    ]
+                },
+                "power_state": {
+                    "type": "string",
+                    "enum": ["ON", "on", "off", "2fa", None],
+                },
+            },
+        }
+        parser = model.JsonSchemaParser()
+        (_, types) = parser.parse(schema)
+        lowered = model.LoweredModels(types)
+        one_of = [x for x in types if isinstance(x, model.OneOfType)][0]
+        enum = [x for x in types if isinstance(x, model.Enum)][0]
+
+        res = lowered.get_one_of(one_of)
+        self.assertTrue(res.is_nullable)
+        self.assertEqual([model.ConstraintString()], res.kinds)
+        self.assertIs(res, lowered.get_one_of(one_of))
+        self.assertEqual(
+            {"On": {"ON", "on"}, "Off": {"off"}, "_2fa": {"2fa"}},
+            lowered.get_enum_variants(enum),
+        )
+        self.assertIn(None, enum.literals)
+        self.assertIs(model.ConstraintString, lowered.get_enum_type(enum))
+        self.assertEqual("PowerState", lowered.get_name("power_state"))
+
+    def test_lowered_one_of_references(self):
+        schema = {
+            "oneOf": [
+                {"type": "object", "properties": {"a": {"type": "string"}}},
+                {"type": "object", "properties": {"a": {"type": "string"}}},
+            ]
+        }
+        parser = model.JsonSchemaParser()
+        (res, types) = parser.parse(schema)
+        lowered = model.LoweredModels(types)
+        assert isinstance(res, model.OneOfType)
+        # Duplicated references are not unwrapped
+        self.assertEqual(2, len(lowered.get_one_of(res).kinds))
+
+    def test_lowered_one_of_combination(self):
+        lowered = model.LoweredModels()
+        ref = model.Reference(name="min_count", type=model.OneOfType)
+        one_of = model.OneOfType(reference=ref)
+        cases: list[tuple[list[str | None], tuple[set[str], str]]] = [
+            (["string", "number"], ({"string", "number"}, "string")),
+            (["integer", "string", None], ({"string", "integer"}, "integer")),
+            (["boolean", "string"], ({"string", "boolean"}, "boolean")),
+            (["string", "object"], ({"string", "object"}, "any")),
+            (["string", "string"], ({"string"}, "string")),
+        ]
+        for kinds, expected in cases:
+            res = lowered.get_one_of_combination(one_of, kinds)
+            assert res is not None
+            self.assertEqual(expected, (res.kinds, res.keep))
+        self.assertIsNone(
+            lowered.get_one_of_combination(one_of, ["string", None])
+        )
+        ref = model.Reference(name="flavor_ref", type=model.OneOfType)
+        res = lowered.get_one_of_combination(
+            model.OneOfType(reference=ref), ["string", "integer"]
+        )
+        assert res is not None
+        self.assertEqual("string", res.keep)
@@ -0,0 +1,49 @@
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+from unittest import TestCase
+
+from codegenerator.common import naming
+
+
+class TestNaming(TestCase):
+    def test_snake_case(self):
+        self.assertEqual("os_sch_hnt", naming.snake_case("OS-SCH-HNT"))
+        self.assertEqual("add_fixed_ip", naming.snake_case("addFixedIp"))
+        self.assertEqual(
+            "add-fixed-ip", naming.snake_case("addFixedIp", separator="-")
+        )
+        self.assertEqual("list", naming.module_name("list"))
+
+    def test_camel_case(self):
+        self.assertEqual("FlavorRef", naming.camel_case("flavorRef"))
+        self.assertEqual("OsSchHnt", naming.camel_case("OS-SCH-HNT"))
+
+    def test_local_name(self):
+        self.assertEqual("_type", naming.local_name("type"))
+        self.assertEqual("_default", naming.local_name("default"))
+        self.assertEqual(
+            "default",
+            naming.local_name("default", frozenset(["type"])),
+        )
+        self.assertEqual(
+            "os_ext_srv_attr_host", naming.local_name("OS-EXT-SRV-ATTR:host")
+        )
+        self.assertEqual("a_b", naming.local_name("a.b"))
+
+    def test_name_scope(self):
+        scope = naming.NameScope()
+        scope.add("Foo", 1)
+        self.assertIn("Foo", scope)
+        self.assertFalse(scope.is_conflicting("Foo", 1))
+        self.assertTrue(scope.is_conflicting("Foo", 2))
+        self.assertFalse(scope.is_conflicting("Bar", 2))
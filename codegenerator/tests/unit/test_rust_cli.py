@@ -10,6 +10,8 @@
 #   License for the specific language governing permissions and limitations
 #   under the License.
 #
+from concurrent.futures import ThreadPoolExecutor
+import copy
 import logging
 from unittest import TestCase
 
@@ -21,6 +23,8 @@ from jinja2 import StrictUndefined
 from codegenerator import base
 from codegenerator import model
 from codegenerator import rust_cli
+from codegenerator import rust_sdk
+from codegenerator.tests.unit import test_model
 
 
 class TestRustCliResponseManager(TestCase):
@@ -68,6 +72,7 @@ struct ResponseData {
             loader=FileSystemLoader("codegenerator/templates"),
             autoescape=select_autoescape(),
             undefined=StrictUndefined,
+            extensions=[base.FragmentCacheExtension],
         )
         env.filters["wrap_markdown"] = base.wrap_markdown
         template = env.get_template("rust_cli/response_struct.j2")
@@ -86,3 +91,63 @@ struct ResponseData {
             "".join([x.rstrip() for x in expected_content.split()]),
             "".join([x.rstrip() for x in content.split()]),
         )
+
+
+class TestRustCliRequestTypeManager(TestCase):
+    def test_get_var_name_for(self):
+        type_manager = rust_cli.RequestTypeManager()
+        for name, expected in [
+            ("flavorRef", "flavor_ref"),
+            ("type", "_type"),
+            ("ref", "_ref"),
+            ("default", "_default"),
+            ("os:scheduler_hints", "os_scheduler_hints"),
+        ]:
+            self.assertEqual(
+                expected,
+                type_manager.get_var_name_for(
+                    model.Reference(name=name, type=model.Struct)
+                ),
+            )
+
+
+class TestTypeManagerThreads(TestCase):
+    def _convert(self, type_manager_class, types):
+        type_manager = type_manager_class()
+        type_manager.set_models(types)
+        return (
+            [
+                (x.name, x.__class__.__name__, x.type_hint, sorted(x.imports))
+                for x in type_manager.get_subtypes()
+            ],
+            type_manager.get_root_data_type().type_hint,
+            sorted(type_manager.get_imports()),
+        )
+
+    def test_concurrent_conversion(self):
+        parser = model.JsonSchemaParser()
+        operations = []
+        for idx in range(10):
+            schema: dict = copy.deepcopy(test_model.SAMPLE_SERVER_SCHEMA)
+            schema["properties"]["server"]["properties"][f"prop{idx}"] = {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "state": {"type": "string", "enum": ["on", "off"]},
+                },
+            }
+            (_, types) = parser.parse(schema)
+            operations.append(types)
+        tasks = [
+            (type_manager_class, types)
+            for types in operations
+            for type_manager_class in [
+                rust_sdk.TypeManager,
+                rust_cli.RequestTypeManager,
+                rust_cli.ResponseTypeManager,
+            ]
+        ] * 2
+        expected = [self._convert(*task) for task in tasks]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda x: self._convert(*x), tasks))
+        self.assertEqual(expected, results)
@@ -11,6 +11,10 @@
 #   under the License.
 #
 import logging
+from pathlib import Path
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
 from unittest import TestCase
 
 from jinja2 import Environment
@@ -20,6 +24,7 @@ from jinja2 import StrictUndefined
 
 from codegenerator import base
 from codegenerator import model
+from codegenerator import rust_cli
 from codegenerator import rust_sdk
 from codegenerator.common import rust as common_rust
 from codegenerator.tests.unit import test_model
@@ -149,6 +154,7 @@ class TestRustSdkModel(TestCase):
             loader=FileSystemLoader("codegenerator/templates"),
             autoescape=select_autoescape(),
             undefined=StrictUndefined,
+            extensions=[base.FragmentCacheExtension],
         )
         env.filters["wrap_markdown"] = base.wrap_markdown
 
@@ -192,6 +198,7 @@ pub struct Request<'a> {
             loader=FileSystemLoader("codegenerator/templates"),
             autoescape=select_autoescape(),
             undefined=StrictUndefined,
+            extensions=[base.FragmentCacheExtension],
         )
         env.filters["wrap_markdown"] = base.wrap_markdown
 
@@ -207,3 +214,369 @@ pub struct Request<'a> {
             "".join([x.rstrip() for x in expected_root_render.split()]),
             "".join([x.rstrip() for x in content.split()]),
         )
+
+    def test_shared_subtypes(self):
+        generator = rust_sdk.RustSdkGenerator()
+        shared_types = rust_sdk.SharedTypes()
+        mod_path = ["compute", "v2"]
+
+        def add_operation(name):
+            type_manager = rust_sdk.TypeManager()
+            type_manager.set_models(test_model.EXPECTED_DATA_TYPES)
+            types = generator._get_subtypes_data(type_manager)
+            shared_types.add_operation(
+                mod_path, "/servers", Path(name), "", types
+            )
+            return types
+
+        types = add_operation("create.rs")
+        self.assertEqual(
+            {
+                "BlockDeviceMapping",
+                "BlockDeviceMappingV2",
+                "NetworksEnum",
+                "OsDcfDiskConfig",
+                "SecurityGroups",
+            },
+            types["Server"]["dependencies"],
+        )
+        # Types used by a single operation are not shared
+        self.assertEqual({}, shared_types.get_types(mod_path))
+        # Module generated again replaces the previous one
+        add_operation("create.rs")
+        self.assertEqual({}, shared_types.get_types(mod_path))
+
+        other_types = add_operation("set.rs")
+        self.assertEqual(
+            sorted(types.keys()), list(shared_types.get_types(mod_path))
+        )
+
+        # Different variant of the type stays local together with the
+        # types referring to it
+        other_types["Networks"]["key"] = None
+        shared = shared_types.get_types(mod_path)
+        self.assertNotIn("Networks", shared)
+        self.assertNotIn("NetworksEnum", shared)
+        self.assertNotIn("Server", shared)
+        self.assertIn("BlockDeviceMappingV2", shared)
+
+        # Variant used by two operations is shared while the other one
+        # stays local. Types referring to it are only shared when all the
+        # operations refer to the same variant.
+        add_operation("update.rs")
+        shared = shared_types.get_types(mod_path)
+        self.assertIn("Networks", shared)
+        self.assertNotIn("Server", shared)
+        other_types["NetworksEnum"]["key"] = None
+        other_types["Server"]["key"] = None
+        shared = shared_types.get_types(mod_path)
+        self.assertIn("NetworksEnum", shared)
+        self.assertIn("Server", shared)
+
+    def test_generate_types_mods(self):
+        generator = rust_sdk.RustSdkGenerator()
+        generator.shared_types = rust_sdk.SharedTypes()
+        mod_path = ["compute", "v2"]
+        content = (
+            f"{rust_sdk.SHARED_TYPES_SLOT}\n// Operation\n"
+            f"{rust_sdk.SUBTYPES_SLOT}"
+        )
+        with (
+            tempfile.TemporaryDirectory() as tmpdir,
+            mock.patch.object(generator, "_format_code"),
+        ):
+            for name in ["create", "set", "show"]:
+                type_manager = rust_sdk.TypeManager()
+                if name == "show":
+                    type_manager.set_models(self.models)
+                else:
+                    type_manager.set_models(test_model.EXPECTED_DATA_TYPES)
+                generator.shared_types.add_operation(
+                    [*mod_path, "server"],
+                    "/servers",
+                    Path(tmpdir, f"{name}.rs"),
+                    content,
+                    generator._get_subtypes_data(type_manager),
+                )
+            self.assertEqual(
+                [(mod_path, "types", "/servers")],
+                generator.generate_types_mods(tmpdir),
+            )
+            create = Path(tmpdir, "create.rs").read_text()
+            set_ = Path(tmpdir, "set.rs").read_text()
+            show = Path(tmpdir, "show.rs").read_text()
+            types = Path(
+                tmpdir, "rust/openstack_sdk/src/api/compute/v2/types.rs"
+            ).read_text()
+        self.assertIn("pub use crate::api::compute::v2::types::{", create)
+        self.assertIn("ServerBuilder", create)
+        self.assertNotIn("pub struct Server", create)
+        self.assertEqual(create, set_)
+        # Nothing is shared with the operation
+        self.assertEqual("\n// Operation\n", show)
+        self.assertIn("pub struct Server", types)
+
+    def test_generate_types_mods_name_conflict(self):
+        generator = rust_sdk.RustSdkGenerator()
+        generator.shared_types = rust_sdk.SharedTypes()
+        mod_path = ["compute", "v2"]
+        with (
+            tempfile.TemporaryDirectory() as tmpdir,
+            mock.patch.object(generator, "_format_code"),
+        ):
+            # Resource module `types` already exists in the service
+            for resource in ["types", "server"]:
+                type_manager = rust_sdk.TypeManager()
+                type_manager.set_models(test_model.EXPECTED_DATA_TYPES)
+                generator.shared_types.add_operation(
+                    [*mod_path, resource],
+                    f"/{resource}",
+                    Path(tmpdir, f"{resource}.rs"),
+                    rust_sdk.SHARED_TYPES_SLOT,
+                    generator._get_subtypes_data(type_manager),
+                )
+            self.assertEqual(
+                [(mod_path, "shared_types", "/types")],
+                generator.generate_types_mods(tmpdir),
+            )
+            self.assertTrue(
+                Path(
+                    tmpdir,
+                    "rust/openstack_sdk/src/api/compute/v2/shared_types.rs",
+                ).exists()
+            )
+            self.assertIn(
+                "pub use crate::api::compute::v2::shared_types::{",
+                Path(tmpdir, "server.rs").read_text(),
+            )
+        generator.shared_types.modules[tuple(mod_path)].add("shared_types")
+        self.assertEqual(
+            "shared_types_1", generator.shared_types.get_mod_name(mod_path)
+        )
+
+    def test_get_adt_by_reference(self):
+        type_manager = rust_sdk.TypeManager()
+        type_manager.set_models(self.models)
+        self.assertIs(
+            self.models[1],
+            type_manager._get_adt_by_reference(
+                model.Reference(name="f", type=model.OneOfType)
+            ),
+        )
+        with self.assertRaises(RuntimeError):
+            type_manager._get_adt_by_reference(
+                model.Reference(name="f", type=model.Struct)
+            )
+
+    def test_derived_views_cached(self):
+        type_manager = rust_sdk.TypeManager()
+        type_manager.set_models(test_model.EXPECTED_DATA_TYPES)
+        root = type_manager.get_root_data_type()
+        self.assertIs(root, type_manager.get_root_data_type())
+        imports = type_manager.get_imports()
+        imports.add("foo::Bar")
+        self.assertNotIn("foo::Bar", type_manager.get_imports())
+        self.assertEqual(
+            type_manager.get_request_static_lifetimes(root),
+            type_manager.get_request_static_lifetimes(root),
+        )
+
+        subtypes = [x.name for x in type_manager.get_subtypes()]
+        self.assertIn("Networks", subtypes)
+        type_manager.discard_model(
+            model.Reference(name="networks", type=model.OneOfType)
+        )
+        subtypes = [x.name for x in type_manager.get_subtypes()]
+        self.assertNotIn("Networks", subtypes)
+
+    def test_set_models_name_conflicts(self):
+        models = [
+            model.Struct(
+                reference=model.Reference(
+                    name="remote", type=model.Struct, hash_=str(idx)
+                ),
+                fields={
+                    field: model.StructField(data_type=model.PrimitiveString())
+                },
+            )
+            for idx, field in enumerate(["type", "id", "domain"])
+        ]
+        type_manager = rust_sdk.TypeManager()
+        type_manager.set_models(models)
+        self.assertEqual(
+            ["RemoteType", "RemoteId", "RemoteDomain"],
+            [type_manager.convert_model(x).name for x in models],
+        )
+        self.assertEqual(
+            [
+                ("Remote", "RemoteStruct"),
+                ("Remote", "RemoteType"),
+                ("Remote", "RemoteDomain"),
+                ("RemoteStruct", "RemoteId"),
+            ],
+            type_manager.model_renames,
+        )
+
+    def test_convert_primitive_shared(self):
+        type_manager = rust_sdk.TypeManager()
+        string = type_manager.convert_model(model.PrimitiveString())
+        self.assertIs(
+            string,
+            rust_sdk.TypeManager().convert_model(model.PrimitiveString()),
+        )
+        self.assertIsNot(
+            string,
+            rust_cli.RequestTypeManager().convert_model(
+                model.PrimitiveString()
+            ),
+        )
+        self.assertIsInstance(
+            type_manager.convert_model(model.ConstraintString(enum=["a"])),
+            rust_sdk.String,
+        )
+
+    def test_fork(self):
+        parameters = [
+            model.RequestParameter(
+                name="tags",
+                location="query",
+                data_type=model.CommaSeparatedList(
+                    item_type=model.ConstraintString()
+                ),
+            ),
+            model.RequestParameter(
+                name="id",
+                location="path",
+                data_type=model.ConstraintString(),
+                is_required=True,
+            ),
+        ]
+        prototype = rust_sdk.TypeManager()
+        prototype.set_parameters(parameters)
+        type_manager = prototype.fork()
+        self.assertIsInstance(type_manager, rust_sdk.TypeManager)
+        self.assertEqual(["tags", "id"], list(type_manager.parameters.keys()))
+        self.assertIs(
+            prototype.parameters["tags"], type_manager.parameters["tags"]
+        )
+        self.assertEqual("csv", type_manager.parameters["tags"].setter_type)
+
+        type_manager.set_models([model.Struct(fields={})])
+        self.assertEqual([], prototype.models)
+        self.assertEqual(
+            ["id"], [k for (k, _) in type_manager.get_parameters("path")]
+        )
+
+    def test_type_mappings(self):
+        mapping = rust_sdk.TypeManager.primitive_type_mapping
+        self.assertIs(rust_sdk.String, mapping[model.ConstraintString])
+        self.assertIs(common_rust.Integer, mapping[model.ConstraintInteger])
+        self.assertIs(
+            rust_sdk.BTreeMap,
+            rust_sdk.TypeManager.data_type_mapping[model.Dictionary],
+        )
+        with self.assertRaises(TypeError):
+            mapping[model.PrimitiveAny] = rust_sdk.String
+        type_manager1 = rust_sdk.TypeManager()
+        type_manager2 = rust_sdk.TypeManager()
+        type_manager1.ignored_models.append(
+            model.Reference(name="foo", type=model.Struct)
+        )
+        self.assertEqual([], type_manager2.ignored_models)
+
+    def test_discard_model(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "foo": {
+                    "type": "object",
+                    "properties": {
+                        "bar": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {"baz": {"type": "string"}},
+                            },
+                        },
+                        "mode": {"type": "string", "enum": ["a", "b"]},
+                    },
+                },
+                "other": {
+                    "type": "object",
+                    "properties": {"x": {"type": "string"}},
+                },
+            },
+        }
+        parser = model.JsonSchemaParser()
+        (_, all_models) = parser.parse(schema)
+        type_manager = rust_sdk.TypeManager()
+        type_manager.set_models(all_models)
+        refs = {x.name: x for x in type_manager.refs.keys()}
+        self.assertIn("Bar", [x.name for x in type_manager.get_subtypes()])
+
+        type_manager.discard_model(refs["foo"])
+        self.assertEqual(
+            ["other", "Body"], [x.name for x in type_manager.refs.keys()]
+        )
+        self.assertEqual(
+            ["Other"], [x.name for x in type_manager.get_subtypes()]
+        )
+        # Discarding already discarded model is a noop
+        type_manager.discard_model(refs["foo"])
+
+
+class TestRustSdkGenerator(TestCase):
+    def test_generate_deep_schema(self):
+        depth = 300
+        schema: dict = {"type": "string"}
+        for i in range(depth):
+            schema = {
+                "type": "object",
+                "properties": {f"level_{i}": schema},
+            }
+        openapi_spec = {
+            "paths": {
+                "/v2/things": {
+                    "post": {
+                        "operationId": "things:post",
+                        "requestBody": {
+                            "content": {"application/json": {"schema": schema}}
+                        },
+                        "responses": {"200": {}},
+                    }
+                }
+            }
+        }
+        args = SimpleNamespace(
+            operation_type="create",
+            operation_name=None,
+            module_name="create",
+            service_type="compute",
+            api_version="v2",
+            alternative_module_path=None,
+            response_key=None,
+            response_list_item_key=None,
+            find_implemented_by_sdk=False,
+            sdk_mod_name=None,
+            module_path=None,
+        )
+        generator = rust_sdk.RustSdkGenerator()
+        with (
+            tempfile.TemporaryDirectory() as tmpdir,
+            mock.patch.object(generator, "_format_code"),
+        ):
+            list(
+                generator.generate(
+                    "compute.thing",
+                    tmpdir,
+                    openapi_spec=openapi_spec,
+                    operation_id="things:post",
+                    args=args,
+                )
+            )
+            content = Path(
+                tmpdir,
+                "rust/openstack_sdk/src/api/compute/v2/thing/create.rs",
+            ).read_text()
+        self.assertIn("pub struct Level1<'a> {", content)
+        self.assertIn(f"pub struct Level{depth - 1}<'a> {{", content)